@@ -1,147 +1,190 @@
 import streamlit as st
-import requests
-import time
 from datetime import datetime
 import pandas as pd
-import threading
-import telebot
-from urllib.parse import urlparse
-import os
-import ast
-import pytz
-import io
-import socket
-import platform
-import json
-from datetime import timezone
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
-# Remover importação de secrets2.py e ler segredos das variáveis de ambiente
-TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-SERVIDOR_URLS = ast.literal_eval(os.environ.get("SERVIDOR_URLS", "{}"))
-PASSWORD = os.environ.get("SENHA", "iptv2024")
-
-EMAIL_USER = os.environ.get("EMAIL_USER")
-EMAIL_PASS = os.environ.get("EMAIL_PASS")
-# Permitir múltiplos destinatários de e-mail
-EMAIL_TO = os.environ.get("EMAIL_TO", "").split(",") if os.environ.get("EMAIL_TO") else []
-
-# Função para mascarar URL
-# Agora retorna sempre apenas "Oculto"
-def mask_url(url):
-    return "Oculto"
-
-# Inicialização do bot com retry
-def init_telegram_bot():
-    for attempt in range(3):
-        try:
-            bot = telebot.TeleBot(TELEGRAM_TOKEN)
-            bot.get_me()
-            return bot
-        except Exception as e:
-            if attempt == 2:
-                st.warning("⚠️ Não foi possível conectar ao Telegram. O monitoramento continuará, mas sem notificações.")
-                return None
-            time.sleep(2)
-
-# Função para enviar mensagem no Telegram com retry
-def send_telegram_message(message, bot):
-    if bot is None:
-        pass
-    else:
-        for attempt in range(3):
-            try:
-                bot.send_message(TELEGRAM_CHAT_ID, message, parse_mode='HTML')
-                break
-            except Exception as e:
-                if attempt == 2:
-                    st.error(f"❌ Erro ao enviar mensagem para o Telegram (tentativa {attempt + 1}/3)")
-                else:
-                    time.sleep(2)
-                    continue
-    # Enviar e-mail também
-    try:
-        send_email_notification("Alerta Monitor IPTV", message)
-    except Exception as e:
-        st.warning(f"Erro ao enviar e-mail: {e}")
-
-# Função para verificar uma única URL com retentativas
-def check_single_url(url, servidor_nome, bot):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "*/*"
+
+from config import TZ, PASSWORD, REFRESH_INTERVAL, MONITOR_EMBEDDED
+from server_registry import get_registry
+from history_store import HistoryStore, to_epoch, from_epoch
+from sketches import rolling_quantiles
+from reports import format_duration
+from history_columns import HistoryColumns
+from state_store import StateStore
+from status_index import StatusIndex, SORT_KEYS
+
+# O painel é somente leitura: verificações, alertas e histórico ficam a cargo do
+# monitor em segundo plano (python -m monitor_daemon), independente de quantas
+# abas estejam abertas.
+# Cada execução do script só desenha: conexões e dados ficam em cache por processo,
+# e tudo o que é calculado a partir do resultado do monitor é guardado pela versão
+# publicada (StateStore.version). Cada sessão fixa a versão que está vendo e só a
+# avança na atualização automática ou em "Atualizar Agora": interações na página
+# (filtros, gráficos) reaproveitam esses cálculos; nada é verificado nem gravado.
+COLUMNS = ["Nome", "URL", "Status", "Tempo de Resposta", "Latência (Ping)", "Última Verificação", "Detalhes"]
+
+# Quedas mostradas na tabela de incidentes do período
+INCIDENT_ROWS = 500
+
+# Linhas por página da tabela de status
+PAGE_SIZES = [25, 50, 100, 200]
+
+# Métricas dos gráficos de tendência: rótulo -> (métrica dos esboços, coluna do histórico)
+TREND_METRICS = {
+    "Tempo de resposta (s)": ("response_time", "tempo_resposta"),
+    "TTFB (s)": ("ttfb", "ttfb"),
+    "Latência (ms)": ("latency", "latencia"),
+}
+
+# Modo embutido: uma única thread de monitoramento por processo do Streamlit
+# (o motor de verificação só é importado nesse modo)
+# Sem spinner: é chamada logo após st.set_page_config, que precisa ser o primeiro elemento
+@st.cache_resource(show_spinner=False)
+def start_embedded_monitor():
+    from monitor_daemon import start_in_background
+    return start_in_background()
+
+# Conexão com o banco do histórico, compartilhada pelas sessões do processo
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+# Histórico recente em colunas NumPy, compartilhado pelas sessões do processo
+@st.cache_resource
+def get_history_columns():
+    return HistoryColumns()
+
+# Estado gravado pelo monitor (status, última tabela, erros), compartilhado pelas sessões
+@st.cache_resource
+def get_state_store():
+    return StateStore()
+
+# Resultado mais recente publicado pelo monitor; uma única cópia por versão para
+# todas as sessões (cada sessão fixa a versão vista até a próxima atualização)
+# O índice da tabela de status (grupo e tags do cadastro na busca) também é por versão
+@st.cache_resource(max_entries=8)
+def load_dashboard(version):
+    dashboard = get_state_store().dashboard()
+    index = StatusIndex(dashboard["rows"], COLUMNS, dashboard["last_error"], get_registry().servers())
+    dashboard["index"] = index
+    dashboard["online"] = index.online_count()
+    # Tempo médio de resposta da última verificação
+    dashboard["avg_response"] = index.avg_response()
+    return dashboard
+
+# Histórico sincronizado uma vez por versão publicada (o monitor grava o histórico
+# antes de publicar): colunas em memória e agregados das últimas 24h
+@st.cache_resource(max_entries=8)
+def load_history(version):
+    now_ts = to_epoch(datetime.now(TZ))
+    view = get_history_columns().sync(get_history_store(), now_ts)
+    view_24h = view.window(now_ts - 86400)
+    return {
+        "now_ts": now_ts,
+        "view": view,
+        "view_24h": view_24h,
+        "uptime_24h_df": view_24h.uptime(),
+        "uptime_24h": view_24h.overall_uptime(),
     }
-    
-    last_status = st.session_state.get(f"last_status_{servidor_nome}", None)
-    start_time = time.time()
-    
-    for attempt in range(3):
-        try:
-            response = requests.get(url, headers=headers, timeout=30, stream=True)
-            response_time = time.time() - start_time
-            
-            try:
-                next(response.iter_content(chunk_size=1024))
-                if last_status == "offline":
-                    send_telegram_message(f"✅ Servidor <b>{servidor_nome}</b> está ONLINE novamente!", bot)
-                st.session_state[f"last_status_{servidor_nome}"] = "online"
-                st.session_state[f"response_time_{servidor_nome}"] = response_time
-                return "🟢 Online", response_time
-            except:
-                if last_status != "offline":
-                    send_telegram_message(f"❌ Servidor <b>{servidor_nome}</b> está OFFLINE!\nErro: Sem conteúdo", bot)
-                st.session_state[f"last_status_{servidor_nome}"] = "offline"
-                return f"🔴 Offline (Sem conteúdo)", None
-                
-        except requests.RequestException as e:
-            if attempt == 2:
-                error_msg = str(e)
-                if last_status != "offline":
-                    send_telegram_message(f"❌ Servidor <b>{servidor_nome}</b> está OFFLINE!\nErro: {error_msg}", bot)
-                st.session_state[f"last_status_{servidor_nome}"] = "offline"
-                
-                if "timeout" in error_msg.lower():
-                    return f"🔴 Offline (Timeout)", None
-                elif "dns" in error_msg.lower():
-                    return f"🔴 Offline (DNS)", None
-                else:
-                    return f"🔴 Offline ({error_msg})", None
-            time.sleep(1)
-    
-    return "❓ Status Desconhecido", None
-
-def ping_host(host, timeout=1):
-    """Retorna a latência em ms ou None se não for possível pingar."""
-    try:
-        if platform.system().lower() == "windows":
-            from subprocess import check_output
-            output = check_output(["ping", "-n", "1", "-w", str(timeout*1000), host]).decode()
-            if "tempo=" in output:
-                return int(output.split("tempo=")[1].split("ms")[0].strip())
-        else:
-            from subprocess import check_output
-            output = check_output(["ping", "-c", "1", "-W", str(timeout), host]).decode()
-            if "time=" in output:
-                return int(float(output.split("time=")[1].split(" ms")[0].strip()))
-    except Exception:
-        return None
 
-# Lista de servidores para monitorar
-servidores = [{"nome": nome, "url": url} for nome, url in SERVIDOR_URLS.items()]
+# Servidores com pior p95 na última hora (seleção padrão dos gráficos de tendência)
+@st.cache_resource(max_entries=6)
+def worst_servers(version, metric, n=3):
+    last_hour = get_history_store().sketch_series(metric, datetime.now(TZ) - pd.Timedelta(hours=1))
+    worst = sorted(last_hour, key=lambda nome: last_hour[nome][-1][1].quantile(0.95) or 0, reverse=True)
+    return worst[:n]
+
+# Série de médias de 5 minutos e percentis p50/p95/p99 por hora em janela móvel,
+# em formato longo para os gráficos
+@st.cache_resource(max_entries=16)
+def trend_frames(version, metric, column, servers, window_hours):
+    history = load_history(version)
+    trend = history["view_24h"].select(servers).frame()
+    trend = (trend.pivot_table(index='timestamp', columns='servidor', values=column,
+                               aggfunc='mean', observed=True)
+             .resample('5min').mean()
+             .stack().rename('valor').reset_index())
+    series = get_history_store().sketch_series(metric, datetime.now(TZ) - pd.Timedelta(days=1), names=servers)
+    percentiles = {}
+    for nome in servers:
+        points = rolling_quantiles(series.get(nome, []), window=window_hours)
+        if points:
+            percentiles[nome] = pd.DataFrame(
+                [{'hora': from_epoch(bucket), 'percentil': label, 'valor': q[p]}
+                 for bucket, q in points for label, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))])
+    return trend, percentiles
+
+# Converte os totais por servidor (agregados do banco) em DataFrame para os gráficos
+def totals_frame(totals):
+    return pd.DataFrame(
+        [{'servidor': nome, 'uptime': round(t['uptime'], 2), 'tempo_medio': t['avg_rt']}
+         for nome, t in totals.items()],
+        columns=['servidor', 'uptime', 'tempo_medio']
+    ).set_index('servidor')
+
+# Totais do período: direto das colunas em memória quando cabem na janela recente;
+# períodos mais antigos somam os agregados diários/horários do banco
+@st.cache_resource(max_entries=8)
+def period_frame(version, start_ts, end_ts):
+    history = load_history(version)
+    if get_history_columns().covers(start_ts, history["now_ts"]):
+        return history["view"].window(start_ts, end_ts).uptime().reset_index()
+    return totals_frame(get_history_store().totals(from_epoch(start_ts), from_epoch(end_ts))).reset_index()
+
+# Quedas do período e indicadores por servidor (SLA, MTTR, MTBF), dos intervalos de incidente
+@st.cache_resource(max_entries=8)
+def incident_frames(version, start_ts, end_ts):
+    store = get_history_store()
+    now_ts = to_epoch(datetime.now(TZ))
+    intervals = pd.DataFrame(
+        [{'Servidor': nome, 'Início': from_epoch(started),
+          'Fim': from_epoch(ended) if ended is not None else None,
+          'Duração': format_duration((ended if ended is not None else now_ts) - started),
+          'Classe': error_class or '-', 'Erro': error or ''}
+         for nome, started, ended, error_class, error
+         in store.incident_intervals(from_epoch(start_ts), from_epoch(end_ts))],
+        columns=['Servidor', 'Início', 'Fim', 'Duração', 'Classe', 'Erro'])
+    # Mais recentes primeiro; a tabela mostra só as últimas INCIDENT_ROWS quedas
+    intervals = intervals.iloc[::-1].head(INCIDENT_ROWS)
+    report = store.incident_report(from_epoch(start_ts), from_epoch(end_ts))
+    summary = pd.DataFrame(
+        [{'Servidor': nome, 'SLA (%)': round(t['sla'], 3), 'Incidentes': t['incidents'],
+          'Indisponível': format_duration(t['downtime']), 'MTTR': format_duration(t['mttr']),
+          'MTBF': format_duration(t['mtbf']), 'Maior queda': format_duration(t['longest'])}
+         for nome, t in sorted(report.items(), key=lambda item: item[1]['sla'])],
+        columns=['Servidor', 'SLA (%)', 'Incidentes', 'Indisponível', 'MTTR', 'MTBF', 'Maior queda'])
+    return intervals, summary
+
+# Cadastro completo (inclusive desativados) por versão do cadastro
+@st.cache_resource(max_entries=2)
+def registered_servers(version):
+    return get_registry().all()
+
+# Gráficos em Vega-Lite direto: st.line_chart/st.bar_chart montam e validam o
+# gráfico com o Altair a cada execução (dezenas de ms por gráfico)
+def bar_chart(data, x, y):
+    st.vega_lite_chart(data, {
+        "mark": {"type": "bar", "tooltip": True},
+        "encoding": {"x": {"field": x, "type": "nominal", "sort": None},
+                     "y": {"field": y, "type": "quantitative"}},
+    }, use_container_width=True)
+
+def line_chart(data, x, y, color=None, x_type="temporal"):
+    encoding = {"x": {"field": x, "type": x_type, "sort": None},
+                "y": {"field": y, "type": "quantitative"}}
+    if color:
+        encoding["color"] = {"field": color, "type": "nominal"}
+    st.vega_lite_chart(data, {"mark": {"type": "line", "tooltip": True}, "encoding": encoding},
+                       use_container_width=True)
 
 # Configuração da página
 st.set_page_config(page_title="Monitor IPTV", page_icon="📺", layout="wide")
 
+if MONITOR_EMBEDDED:
+    start_embedded_monitor()
+
 # Configurar tema escuro/claro
 if 'theme' not in st.session_state:
     st.session_state.theme = "dark"
 
-# Inicializar bot do Telegram
-bot = init_telegram_bot()
-
 # Sidebar para configurações
 with st.sidebar:
     st.title("⚙️ Configurações")
@@ -173,42 +216,22 @@ with st.sidebar:
 # Título principal
 st.title("📺 Monitor de Servidores IPTV")
 
-# Função para verificar URLs
-# Corrigir timezone para GMT-3 (America/Sao_Paulo) usando pytz
-TZ = pytz.timezone('America/Sao_Paulo')
-def check_urls(bot):
-    results = []
-    for servidor in servidores:
-        status, response_time = check_single_url(servidor["url"], servidor["nome"], bot)
-        # Teste de latência (ping)
-        try:
-            host = servidor["url"].split("//")[-1].split("/")[0]
-            latency = ping_host(host)
-        except Exception:
-            latency = None
-        results.append({
-            "Nome": servidor["nome"],
-            "URL": mask_url(servidor["url"]),
-            "Status": status,
-            "Tempo de Resposta": f"{response_time:.2f}s" if response_time else "N/A",
-            "Latência (Ping)": f"{latency} ms" if latency is not None else "N/A",
-            "Última Verificação": datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S"),
-            "Detalhes": status if "Offline" in status else ""
-        })
-    return pd.DataFrame(results)
-
 # Inicializar ou atualizar dados
-if 'last_refresh' not in st.session_state:
-    st.session_state.last_refresh = datetime.now(TZ)
-    st.session_state.df = check_urls(bot)
+# O monitor publica várias vezes por segundo; a versão da sessão fica fixa entre atualizações
+if 'loaded_at' not in st.session_state:
+    st.session_state.loaded_at = datetime.now(TZ)
+    st.session_state.version = get_state_store().version()
+version = st.session_state.version
+dashboard = load_dashboard(version)
 
 # Controles de atualização
 col_refresh, col_auto = st.columns([1, 2])
 
 with col_refresh:
     if st.button("🔄 Atualizar Agora"):
-        st.session_state.last_refresh = datetime.now(TZ)
-        st.session_state.df = check_urls(bot)
+        st.session_state.loaded_at = datetime.now(TZ)
+        version = st.session_state.version = get_state_store().version()
+        dashboard = load_dashboard(version)
 
 with col_auto:
     auto_refresh = st.checkbox("Atualização Automática", value=True)
@@ -216,166 +239,28 @@ with col_auto:
                                min_value=30, max_value=300, value=60)
 
 # Mostrar última atualização
-st.caption(f"Última atualização: {st.session_state.last_refresh.strftime('%Y-%m-%d %H:%M:%S')}")
-
-# --- Persistência do Histórico em JSON ---
-def save_history():
-    try:
-        with open('historico_uptime.json', 'w', encoding='utf-8') as f:
-            json.dump([
-                {'timestamp': h['timestamp'].strftime('%Y-%m-%d %H:%M:%S'), 'status': h['status']}
-                for h in st.session_state.history
-            ], f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        st.warning(f"Erro ao salvar histórico: {e}")
-
-def load_history():
-    try:
-        with open('historico_uptime.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # Converte timestamp para datetime com timezone correto
-        return [
-            {'timestamp': datetime.strptime(h['timestamp'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=TZ), 'status': h['status']}
-            for h in data
-        ]
-    except Exception:
-        return []
-
-# Carregar histórico persistente ao iniciar
-if 'history' not in st.session_state:
-    st.session_state.history = load_history()
-
-# Gerenciar histórico
-current_status = {
-    'timestamp': datetime.now(TZ),
-    'status': {servidor['nome']: 'Online' in st.session_state.df[st.session_state.df['Nome'] == servidor['nome']]['Status'].iloc[0] 
-               for servidor in servidores}
-}
-st.session_state.history.append(current_status)
-# Limitar histórico a 24 horas
-one_day_ago = datetime.now(TZ) - pd.Timedelta(days=1)
-st.session_state.history = [h for h in st.session_state.history if h['timestamp'] > one_day_ago]
-save_history()
-
-# --- Relatório diário automático (envia às 23:59) ---
-now = datetime.now(TZ)
-if now.hour == 23 and now.minute == 59 and 'last_daily_report' not in st.session_state:
-    send_daily_report(bot)
-    st.session_state['last_daily_report'] = now.date()
-if 'last_daily_report' in st.session_state and st.session_state['last_daily_report'] != now.date():
-    del st.session_state['last_daily_report']
-
-# Função para enviar relatório diário automático no Telegram
-# (precisa estar definida antes do uso)
-def send_daily_report(bot):
-    if bot is None:
-        return
-    try:
-        with open('historico_uptime.json', 'r', encoding='utf-8') as f:
-            history = json.load(f)
-    except Exception:
-        history = []
-    if not history:
-        return
-    total = len(history)
-    if total == 0:
-        return
-    servidores = list(history[-1]['status'].keys())
-    online_counts = {s: 0 for s in servidores}
-    for h in history:
-        for s in servidores:
-            if h['status'].get(s):
-                online_counts[s] += 1
-    uptime_percent = {s: (online_counts[s]/total)*100 for s in servidores}
-    incidentes = {s: total-online_counts[s] for s in servidores}
-    msg = '<b>📊 Relatório Diário IPTV</b>\n'
-    for s in servidores:
-        msg += f"\n<b>{s}</b>: Uptime: {uptime_percent[s]:.1f}% | Incidentes: {incidentes[s]}"
-    send_telegram_message(msg, bot)
-
-# --- Relatório semanal/mensal automático ---
-def send_periodic_report(bot, period='semanal'):
-    if bot is None and not EMAIL_TO:
-        return
-    try:
-        with open('historico_uptime.json', 'r', encoding='utf-8') as f:
-            history = json.load(f)
-    except Exception:
-        history = []
-    if not history:
-        return
-    now = datetime.now(TZ)
-    if period == 'semanal':
-        start = now - pd.Timedelta(days=7)
-        title = '📊 Relatório Semanal IPTV'
-    else:
-        start = now - pd.Timedelta(days=30)
-        title = '📊 Relatório Mensal IPTV'
-    filtered = [h for h in history if h['timestamp'] > start]
-    if not filtered:
-        return
-    servidores = list(filtered[-1]['status'].keys())
-    total = len(filtered)
-    online_counts = {s: 0 for s in servidores}
-    for h in filtered:
-        for s in servidores:
-            if h['status'].get(s):
-                online_counts[s] += 1
-    uptime_percent = {s: (online_counts[s]/total)*100 for s in servidores}
-    incidentes = {s: total-online_counts[s] for s in servidores}
-    msg = f'<b>{title}</b>\n'
-    for s in servidores:
-        msg += f"\n<b>{s}</b>: Uptime: {uptime_percent[s]:.1f}% | Incidentes: {incidentes[s]}"
-    send_telegram_message(msg, bot)
-    send_email_notification(title, msg)
-
-# --- Agendamento automático semanal/mensal ---
-now = datetime.now(TZ)
-if now.weekday() == 0 and now.hour == 8 and 'last_weekly_report' not in st.session_state:
-    send_periodic_report(bot, 'semanal')
-    st.session_state['last_weekly_report'] = now.date()
-if 'last_weekly_report' in st.session_state and st.session_state['last_weekly_report'] != now.date():
-    del st.session_state['last_weekly_report']
-if now.day == 1 and now.hour == 8 and 'last_monthly_report' not in st.session_state:
-    send_periodic_report(bot, 'mensal')
-    st.session_state['last_monthly_report'] = now.month
-if 'last_monthly_report' in st.session_state and st.session_state['last_monthly_report'] != now.month:
-    del st.session_state['last_monthly_report']
-
-# --- Exibir Última Mensagem de Erro ---
-# Salva última mensagem de erro para cada servidor
-if 'last_error' not in st.session_state:
-    st.session_state.last_error = {}
-for servidor in servidores:
-    nome = servidor['nome']
-    status_row = st.session_state.df[st.session_state.df['Nome'] == nome]
-    if not status_row.empty and 'Offline' in status_row['Status'].iloc[0]:
-        st.session_state.last_error[nome] = status_row['Status'].iloc[0]
+if dashboard['last_refresh'] is None:
+    st.warning("Nenhum resultado do monitor ainda. Inicie-o com `python -m monitor_daemon` "
+               "(ou defina MONITOR_EMBEDDED=1).")
+else:
+    st.caption(f"Última atualização: {dashboard['last_refresh'].strftime('%Y-%m-%d %H:%M:%S')}")
+    if dashboard['queue']:
+        st.caption("Fila de verificação: {scheduled} agendados, {overdue} atrasados, "
+                   "{in_progress} em andamento".format(**dashboard['queue']))
+    if (datetime.now(TZ) - dashboard['last_refresh']).total_seconds() > 3 * REFRESH_INTERVAL:
+        st.warning("⚠️ O monitor em segundo plano parece parado: o último resultado está desatualizado.")
+
+# Histórico recente em colunas (só as amostras novas são lidas do banco, uma vez por versão)
+history = load_history(version)
+uptime_24h_df = history["uptime_24h_df"]
 
 # --- Dashboard Resumido ---
 # Calcula métricas principais antes do dashboard
-total_servers = len(servidores)
-online_servers = len([x for x in st.session_state.df["Status"] if "Online" in x])
+total_servers = len(get_registry().servers())
+online_servers = dashboard['online']
 offline_servers = total_servers - online_servers
-uptime_24h = 0
-avg_response = 0
-if len(st.session_state.history) > 0:
-    # Uptime nas últimas 24h (proporção de servidores online em cada registro)
-    total_registros = len([h for h in st.session_state.history if h['timestamp'] > one_day_ago])
-    if total_registros > 0:
-        uptime_24h = sum(
-            sum(1 for v in h['status'].values() if v) / len(h['status'])
-            for h in st.session_state.history if h['timestamp'] > one_day_ago
-        ) / total_registros * 100
-    else:
-        uptime_24h = 0
-    # Tempo médio de resposta
-    valid_responses = [
-        float(getattr(r, 'Tempo_de_Resposta', getattr(r, 'Tempo de Resposta', 'N/A')).replace('s',''))
-        for r in st.session_state.df.itertuples()
-        if getattr(r, 'Tempo_de_Resposta', getattr(r, 'Tempo de Resposta', 'N/A')) != 'N/A'
-    ]
-    avg_response = sum(valid_responses) / len(valid_responses) if valid_responses else 0
+uptime_24h = history["uptime_24h"]
+avg_response = dashboard['avg_response'] if len(history["view_24h"]) else 0
 
 # Dashboard
 st.markdown("""
@@ -396,25 +281,32 @@ st.markdown("""
     <b>Tempo Médio:</b><br> <span style='font-size: 1.5em;'>{}</span>
   </div>
 </div>
-""".format(total_servers, online_servers, offline_servers, uptime_24h if len(st.session_state.history) > 0 else 0, avg_response), unsafe_allow_html=True)
+""".format(total_servers, online_servers, offline_servers, uptime_24h, avg_response), unsafe_allow_html=True)
 
 # Gráfico de Uptime
-if show_history and st.session_state.history:
+if show_history and not uptime_24h_df.empty:
     st.subheader("📈 Uptime nas Últimas 24h")
-    history_df = pd.DataFrame([
-        {'timestamp': h['timestamp'], 'servidor': k, 'status': v}
-        for h in st.session_state.history
-        for k, v in h['status'].items()
-    ])
-    uptime_df = history_df.groupby('servidor')['status'].mean().reset_index()
-    uptime_df['uptime'] = (uptime_df['status'] * 100).round(2)
-    st.bar_chart(uptime_df.set_index('servidor')['uptime'])
+    bar_chart(uptime_24h_df.reset_index(), 'servidor', 'uptime')
     # Gráfico de tendência do tempo de resposta
     st.subheader("📉 Tendência do Tempo de Resposta (últimas 24h)")
-    if 'df' in st.session_state:
-        trend_df = st.session_state.df[['Nome', 'Tempo de Resposta']].copy()
-        trend_df['Tempo de Resposta'] = trend_df['Tempo de Resposta'].apply(lambda x: float(x.replace('s','')) if x != 'N/A' else None)
-        st.line_chart(trend_df.set_index('Nome')['Tempo de Resposta'])
+    col_metric, col_servers = st.columns([1, 2])
+    with col_metric:
+        metric_label = st.selectbox("Métrica", list(TREND_METRICS))
+        window_hours = st.slider("Janela dos percentis (horas)", min_value=1, max_value=6, value=1)
+    metric, column = TREND_METRICS[metric_label]
+    # Por padrão, os servidores com pior p95 na última hora
+    with col_servers:
+        trend_servers = st.multiselect("Servidores", list(uptime_24h_df.index),
+                                       default=worst_servers(version, metric))
+    if trend_servers:
+        # Série real das amostras (médias de 5 minutos)
+        trend_df, percentiles = trend_frames(version, metric, column, tuple(trend_servers), window_hours)
+        line_chart(trend_df, 'timestamp', 'valor', color='servidor')
+        # Percentis p50/p95/p99 por hora em janela móvel (esboços de quantis)
+        for nome in trend_servers:
+            if nome in percentiles:
+                st.caption(f"{nome}: p50 / p95 / p99 ({metric_label})")
+                line_chart(percentiles[nome], 'hora', 'valor', color='percentil')
 
 # --- Filtros avançados por período ---
 st.subheader("⏳ Filtro por Período")
@@ -424,43 +316,42 @@ with col1:
 with col2:
     data_fim = st.date_input("Data final", value=datetime.now(TZ).date())
 
-# Filtrar histórico por período
-history_filtered = [
-    h for h in st.session_state.history
-    if data_inicio <= h['timestamp'].date() <= data_fim
-]
+period_start = TZ.localize(datetime.combine(data_inicio, datetime.min.time()))
+period_end = TZ.localize(datetime.combine(data_fim + pd.Timedelta(days=1), datetime.min.time()))
+period_df = period_frame(version, to_epoch(period_start), to_epoch(period_end))
 
 # --- Gráficos detalhados ---
-if show_history and history_filtered:
+if show_history and not period_df.empty:
     st.subheader("📊 Uptime por Servidor no Período")
-    history_df = pd.DataFrame([
-        {'timestamp': h['timestamp'], 'servidor': k, 'status': v}
-        for h in history_filtered
-        for k, v in h['status'].items()
-    ])
-    uptime_df = history_df.groupby('servidor')['status'].mean().reset_index()
-    uptime_df['uptime'] = (uptime_df['status'] * 100).round(2)
-    st.bar_chart(uptime_df.set_index('servidor')['uptime'])
+    bar_chart(period_df, 'servidor', 'uptime')
     st.subheader("📉 Tempo de Resposta Médio por Servidor")
-    if 'df' in st.session_state:
-        trend_df = st.session_state.df[['Nome', 'Tempo de Resposta']].copy()
-        trend_df['Tempo de Resposta'] = trend_df['Tempo de Resposta'].apply(lambda x: float(x.replace('s','')) if x != 'N/A' else None)
-        st.line_chart(trend_df.set_index('Nome')['Tempo de Resposta'])
+    line_chart(period_df, 'servidor', 'tempo_medio', x_type="nominal")
+
+# --- Incidentes do período ---
+incidents_df, sla_df = incident_frames(version, to_epoch(period_start), to_epoch(period_end))
+st.subheader("🚨 Incidentes no Período")
+if incidents_df.empty:
+    st.caption("Nenhuma queda registrada no período.")
+else:
+    st.dataframe(incidents_df, hide_index=True, use_container_width=True)
+if not sla_df.empty:
+    st.dataframe(sla_df, hide_index=True, use_container_width=True)
 
 # Tabela de Status
+# Filtros, busca e ordenação consultam o índice da versão; só a página visível é montada
 st.subheader("🖥️ Status dos Servidores")
-filtered_df = st.session_state.df.copy()
-if status_filter:
-    filtered_df = filtered_df[filtered_df['Status'].apply(lambda x: any(status in x for status in status_filter))]
-
-# Adiciona coluna de detalhes do erro (hover)
-filtered_df["Detalhes"] = filtered_df["Status"].apply(lambda x: x if "Offline" in x else "")
-
-# Atualiza tabela para mostrar latência
-filtered_df["Último Erro"] = filtered_df["Nome"].apply(lambda n: st.session_state.last_error.get(n, ""))
+col_search, col_sort, col_order, col_size = st.columns([3, 2, 1, 1])
+search = col_search.text_input("Buscar (nome, grupo ou tag)")
+sort_key = col_sort.selectbox("Ordenar por", SORT_KEYS)
+descending = col_order.checkbox("Decrescente")
+page_size = col_size.selectbox("Por página", PAGE_SIZES, index=1)
+selected = dashboard['index'].select(tuple(status_filter), search, sort_key, descending)
+pages = max(1, -(-len(selected) // page_size))
+page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+st.caption(f"{len(selected)} de {len(dashboard['index'])} servidores")
 
 st.dataframe(
-    filtered_df,
+    dashboard['index'].page(selected, page, page_size),
     column_config={
         "Nome": st.column_config.TextColumn("Nome", width="medium"),
         "URL": st.column_config.TextColumn("URL (Credenciais Ocultas)", width="large"),
@@ -492,60 +383,46 @@ if not st.session_state.authenticated:
 # --- Dica de uso mobile ---
 st.info("💡 Dica: Para melhor experiência em dispositivos móveis, use o navegador na horizontal.")
 
-# --- Adição/remoção de servidores via interface (temporário) ---
+# --- Cadastro de servidores via interface ---
+# As alterações são gravadas no cadastro (server_registry), valem para todas as
+# sessões e são aplicadas pelo monitor sem reinício
 with st.sidebar:
-    st.subheader("📝 Gerenciar Servidores (sessão)")
-    if 'custom_servers' not in st.session_state:
-        st.session_state.custom_servers = []
-    novo_nome = st.text_input("Nome do novo servidor")
-    novo_url = st.text_input("URL do novo servidor")
-    if st.button("Adicionar Servidor") and novo_nome and novo_url:
-        st.session_state.custom_servers.append({"nome": novo_nome, "url": novo_url})
-        st.success(f"Servidor '{novo_nome}' adicionado!")
-    if st.session_state.custom_servers:
-        remove_nome = st.selectbox("Remover servidor", [s['nome'] for s in st.session_state.custom_servers])
-        if st.button("Remover Selecionado"):
-            st.session_state.custom_servers = [s for s in st.session_state.custom_servers if s['nome'] != remove_nome]
-            st.success(f"Servidor '{remove_nome}' removido!")
-
-# --- Atualiza lista de servidores ---
-servidores = [{"nome": nome, "url": url} for nome, url in SERVIDOR_URLS.items()]
-servidores += st.session_state.get('custom_servers', [])
-
-# Atualizar dados com servidores personalizados
-if 'last_refresh' not in st.session_state:
-    st.session_state.last_refresh = datetime.now(TZ)
-    st.session_state.df = check_urls(bot)
-
-# Atualização automática
-if auto_refresh and (datetime.now(TZ) - st.session_state.last_refresh).seconds >= refresh_interval:
-    st.session_state.df = check_urls(bot)
-    st.session_state.last_refresh = datetime.now(TZ)
-    st.rerun()
+    st.subheader("📝 Gerenciar Servidores")
+    registry = get_registry()
+    with st.form("novo_servidor", clear_on_submit=True):
+        novo_nome = st.text_input("Nome do servidor")
+        novo_url = st.text_input("URL do servidor")
+        novo_grupo = st.text_input("Grupo (opcional)")
+        novas_tags = st.text_input("Tags separadas por vírgula (opcional)")
+        col_int, col_timeout = st.columns(2)
+        novo_intervalo = col_int.number_input("Intervalo (s)", min_value=0, value=0,
+                                              help="0 = intervalo padrão do monitor")
+        novo_timeout = col_timeout.number_input("Timeout (s)", min_value=0, value=0,
+                                                help="0 = timeout padrão")
+        if st.form_submit_button("Adicionar/Atualizar Servidor") and novo_nome and novo_url:
+            # Só os campos preenchidos: num servidor existente, os demais (grupo, tags,
+            # verificação profunda, ativo...) mantêm o valor cadastrado
+            campos = {"grupo": novo_grupo, "tags": novas_tags, "intervalo": novo_intervalo, "timeout": novo_timeout}
+            registry.add(dict({"nome": novo_nome, "url": novo_url}, **{k: v for k, v in campos.items() if v}))
+            st.success(f"Servidor '{novo_nome}' salvo!")
+    cadastrados = registered_servers(registry.version())
+    if cadastrados:
+        selecionado = st.selectbox("Servidor cadastrado", [s['nome'] for s in cadastrados])
+        servidor = next(s for s in cadastrados if s['nome'] == selecionado)
+        ativo = servidor.get("ativo", True)
+        col_toggle, col_remove = st.columns(2)
+        if col_toggle.button("Desativar" if ativo else "Ativar"):
+            registry.set_enabled([selecionado], not ativo)
+            st.rerun()
+        if col_remove.button("Remover"):
+            registry.remove([selecionado])
+            st.rerun()
 
-# Mensagem inicial do Telegram
-if 'telegram_initialized' not in st.session_state and bot is not None:
-    try:
-        send_telegram_message("✅ Monitor IPTV iniciado e conectado ao Telegram!", bot)
-        st.session_state.telegram_initialized = True
-        st.success("✅ Bot do Telegram conectado com sucesso!")
-    except Exception as e:
-        st.warning("⚠️ Monitor iniciado, mas não foi possível enviar mensagem no Telegram.")
-
-def send_email_notification(subject, body):
-    if not (EMAIL_USER and EMAIL_PASS and EMAIL_TO):
-        return
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = ", ".join(EMAIL_TO)
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(EMAIL_USER, EMAIL_PASS)
-            server.sendmail(EMAIL_USER, EMAIL_TO, msg.as_string())
-    except Exception as e:
-        st.warning(f"Erro ao enviar e-mail: {e}")
+# Atualização automática (relê o resultado do monitor)
+if auto_refresh and (datetime.now(TZ) - st.session_state.loaded_at).total_seconds() >= refresh_interval:
+    st.session_state.loaded_at = datetime.now(TZ)
+    st.session_state.version = get_state_store().version()
+    st.rerun()
 
 # --- Interface mobile responsiva ---
 st.markdown("""
@@ -0,0 +1,197 @@
+# Benchmark do monitor contra uma fazenda local de servidores IPTV falsos (fake_farm.py)
+# Para cada tamanho, executa rodadas de check_urls, grava o histórico e gera os
+# relatórios, medindo tempo de rodada, p50/p99 por verificação, CPU, RSS e E/S.
+# Uso: python -m benchmark [--tamanhos 10,100,1000,5000] [--saida atual.json] [--base base.json]
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Resultados lidos de /proc/self/io (Linux); ausentes em outros sistemas
+IO_FIELDS = ("rchar", "wchar", "read_bytes", "write_bytes")
+
+class CollectingDispatcher:
+    """Recebe alertas e relatórios no lugar do NotificationDispatcher, sem enviar nada."""
+
+    telegram_enabled = True
+    enabled = True
+
+    def __init__(self):
+        self.messages = []
+
+    def notify(self, message, subject=None):
+        self.messages.append((subject, message))
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def _io():
+    try:
+        with open("/proc/self/io") as f:
+            data = dict(line.split(":") for line in f.read().splitlines())
+        return {k: int(data[k]) for k in IO_FIELDS if k in data}
+    except OSError:
+        return {}
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _cpu():
+    times = os.times()
+    return times.user + times.system
+
+def _peak_rss_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+def _raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+# Executa `rounds` rodadas com `n` servidores e retorna as medições
+def run_size(n, args, farm_port, dead_port, workdir):
+    import fake_farm
+    from monitor_core import check_urls, record_history
+    from reports import send_daily_report, send_periodic_report
+    from history_store import HistoryStore
+    from state_store import StateStore
+    from metrics import PROBE_LAST_PHASE_SECONDS
+    from config import TZ
+
+    modes = fake_farm.plan(n, args.mortos, args.lentos, args.html, args.timeouts)
+    servidores = fake_farm.servers(modes, farm_port, dead_port, args.hosts)
+    state = StateStore(os.path.join(workdir, f"estado_{n}.db"))
+    store = HistoryStore(os.path.join(workdir, f"historico_{n}.db"))
+    dispatcher = CollectingDispatcher()
+
+    sweeps, history, probes = [], [], []
+    cpu_before, io_before = _cpu(), _io()
+    started = datetime.now(TZ) - timedelta(minutes=args.rodadas)
+    for i in range(args.rodadas):
+        t0 = time.perf_counter()
+        _, samples = check_urls(servidores, dispatcher, state)
+        sweeps.append(time.perf_counter() - t0)
+        probes += [PROBE_LAST_PHASE_SECONDS.get(server=s["nome"], phase="total") for s in servidores]
+        # Rodadas espaçadas de um minuto no histórico para exercitar os agregados
+        t0 = time.perf_counter()
+        record_history(store, samples, started + timedelta(minutes=i), state)
+        history.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    send_daily_report(dispatcher, store)
+    send_periodic_report(dispatcher, store, 'semanal')
+    send_periodic_report(dispatcher, store, 'mensal')
+    reports = time.perf_counter() - t0
+    cpu, io_after = _cpu() - cpu_before, _io()
+
+    store.close()
+    state.close()
+    probes = [p for p in probes if p is not None]
+    online = sum(1 for _, o, *_ in samples if o)
+    return {
+        "servidores": n,
+        "online": online,
+        "rodada_s": sum(sweeps) / len(sweeps),
+        "rodada_max_s": max(sweeps),
+        "p50_s": percentile(probes, 50),
+        "p99_s": percentile(probes, 99),
+        "historico_ms": sum(history) / len(history) * 1000,
+        "relatorios_ms": reports * 1000,
+        "cpu_s": cpu,
+        "rss_mb": _rss_mb(),
+        "rss_pico_mb": _peak_rss_mb(),
+        "io": {k: io_after[k] - io_before.get(k, 0) for k in io_after},
+        "alertas": len(dispatcher.messages),
+    }
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+def print_table(results, base=None):
+    base = {r["servidores"]: r for r in (base or [])}
+    print(f"{'servidores':>10} {'online':>6} {'rodada':>9} {'p50':>8} {'p99':>8} {'histórico':>10} "
+          f"{'relatórios':>10} {'CPU':>8} {'RSS':>8} {'escrita':>10}")
+    for r in results:
+        written = r["io"].get("write_bytes", r["io"].get("wchar"))
+        line = (f"{r['servidores']:>10} {r['online']:>6} {_fmt(r['rodada_s'], '8.2f')}s "
+                f"{_fmt(r['p50_s'], '7.3f')}s {_fmt(r['p99_s'], '7.3f')}s {_fmt(r['historico_ms'], '8.1f')}ms "
+                f"{_fmt(r['relatorios_ms'], '8.1f')}ms {_fmt(r['cpu_s'], '7.2f')}s {_fmt(r['rss_mb'], '6.0f')}MB "
+                f"{_fmt(written / 1024 if written is not None else None, '8.0f')}KB")
+        previous = base.get(r["servidores"])
+        if previous:
+            deltas = []
+            for key in ("rodada_s", "p99_s", "cpu_s", "rss_mb"):
+                if previous.get(key) and r.get(key) is not None:
+                    deltas.append(f"{key} {100 * (r[key] / previous[key] - 1):+.0f}%")
+            line += "  | vs base: " + ", ".join(deltas)
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do monitor com servidores IPTV falsos")
+    parser.add_argument("--tamanhos", default="10,100,1000,5000",
+                        help="quantidades de servidores, separadas por vírgula (padrão: %(default)s)")
+    parser.add_argument("--rodadas", type=int, default=3, help="rodadas por tamanho")
+    parser.add_argument("--hosts", type=int, default=250, help="endereços 127.x distintos")
+    parser.add_argument("--latencia", type=float, default=0.02, help="latência média da fazenda (s)")
+    parser.add_argument("--mortos", type=float, default=0.05)
+    parser.add_argument("--lentos", type=float, default=0.05)
+    parser.add_argument("--html", type=float, default=0.05)
+    parser.add_argument("--timeouts", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=2.0, help="timeout de cada requisição (s)")
+    parser.add_argument("--profundo", action="store_true", help="ativa a verificação profunda (PROBE_DEEP)")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--base", help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args(argv)
+
+    # As configurações são lidas na importação dos módulos do monitor
+    os.environ["PROBE_TIMEOUT"] = str(args.timeout)
+    os.environ["LATENCY_TIMEOUT"] = str(args.timeout)
+    os.environ["PROBE_DEEP"] = "1" if args.profundo else "0"
+    os.environ.setdefault("TELEGRAM_TOKEN", "")
+    _raise_fd_limit()
+
+    import fake_farm
+    farm, farm_port = fake_farm.start_farm(latency=args.latencia, hang_seconds=args.timeout * 4)
+    workdir = tempfile.mkdtemp(prefix="benchmark-iptv-")
+    results = []
+    try:
+        for n in (int(x) for x in args.tamanhos.split(",") if x.strip()):
+            print(f"... {n} servidores", file=sys.stderr, flush=True)
+            results.append(run_size(n, args, farm_port, fake_farm.dead_port(), workdir))
+    finally:
+        farm.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    base = None
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)["resultados"]
+    print_table(results, base)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"data": datetime.now().isoformat(timespec="seconds"), "argumentos": vars(args),
+                       "resultados": results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# Verificação distribuída: um agregador e N workers (processos ou máquinas)
+# A lista de servidores (cadastro em server_registry) é dividida entre os workers
+# por hash consistente; cada worker verifica a sua parte e envia resultados compactos
+# ao agregador, único dono do estado, dos alertas, do histórico e dos dados do painel.
+# Workers entram com o primeiro heartbeat e saem ao encerrar ou quando param de
+# responder; só os servidores do worker que entrou/saiu mudam de dono.
+# Uso local: python -m monitor_daemon --agregador
+#            python -m monitor_daemon --worker http://127.0.0.1:8700   (em N terminais)
+import os
+import time
+import json
+import socket
+import bisect
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from config import TZ, REFRESH_INTERVAL
+from monitor_core import load_servers, apply_results, record_history, ContinuousProbes
+from providers import provider_groups
+from scheduler import ProbeScheduler
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_PORT = int(os.environ.get("CLUSTER_PORT", "8700"))
+CLUSTER_ADDR = os.environ.get("CLUSTER_ADDR", "127.0.0.1")
+# Segredo compartilhado entre agregador e workers (cabeçalho X-Cluster-Token)
+CLUSTER_TOKEN = os.environ.get("CLUSTER_TOKEN", "")
+HEARTBEAT_INTERVAL = float(os.environ.get("CLUSTER_HEARTBEAT", "5"))
+# Sem heartbeat por esse tempo, o worker sai do anel e seus servidores são redistribuídos
+WORKER_TIMEOUT = float(os.environ.get("CLUSTER_WORKER_TIMEOUT", str(HEARTBEAT_INTERVAL * 4)))
+VIRTUAL_NODES = 64
+# Quantos workers verificam cada servidor: com 2 ou mais, as falhas de agentes
+# diferentes compõem o quórum de alertas (config.ALERT_QUORUM)
+CLUSTER_REPLICAS = max(1, int(os.environ.get("CLUSTER_REPLICAS", "1")))
+
+class HashRing:
+    """Anel de hash consistente com nós virtuais."""
+
+    def __init__(self, nodes=(), replicas=VIRTUAL_NODES):
+        self.replicas = replicas
+        self.keys = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if h not in self.owners:
+                bisect.insort(self.keys, h)
+                self.owners[h] = node
+
+    def remove(self, node):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if self.owners.get(h) == node:
+                del self.owners[h]
+                self.keys.pop(bisect.bisect_left(self.keys, h))
+
+    def owner(self, key):
+        if not self.keys:
+            return None
+        i = bisect.bisect(self.keys, self._hash(key)) % len(self.keys)
+        return self.owners[self.keys[i]]
+
+    # Os `n` primeiros nós distintos a partir da chave, no sentido do anel
+    def owners_of(self, key, n):
+        result = []
+        if not self.keys:
+            return result
+        start = bisect.bisect(self.keys, self._hash(key))
+        for i in range(len(self.keys)):
+            node = self.owners[self.keys[(start + i) % len(self.keys)]]
+            if node not in result:
+                result.append(node)
+                if len(result) == n:
+                    break
+        return result
+
+class Aggregator:
+    """Recebe heartbeats e resultados dos workers; grava estado, alertas e histórico."""
+
+    def __init__(self, state, store, dispatcher):
+        self.state = state
+        self.store = store
+        self.dispatcher = dispatcher
+        self.lock = threading.Lock()
+        self.ingest_lock = threading.Lock()
+        self.ring = HashRing()
+        self.workers = {}       # id -> {"last_seen": monotônico, "queue": {...}}
+        self.epoch = 0
+        self.published_at = 0
+        self.servers = load_servers()
+
+    # Lista atual do cadastro (relida só quando o cadastro muda)
+    def _current_servers(self):
+        self.servers = load_servers()
+        return self.servers
+
+    # Registra o worker (entrando no anel na primeira vez) e devolve a sua parte da lista
+    def heartbeat(self, worker, queue=None):
+        with self.lock:
+            if worker not in self.workers:
+                self.ring.add(worker)
+                self.epoch += 1
+                logger.info("Worker %s entrou (%d no cluster)", worker, len(self.workers) + 1)
+            self.workers[worker] = {"last_seen": time.monotonic(), "queue": queue}
+            servers = self._current_servers()
+            shard = [s for s in servers if worker in self.ring.owners_of(s["nome"], CLUSTER_REPLICAS)]
+            return {"epoch": self.epoch, "servers": shard}
+
+    def leave(self, worker):
+        with self.lock:
+            if self.workers.pop(worker, None) is not None:
+                self.ring.remove(worker)
+                self.epoch += 1
+                logger.info("Worker %s saiu (%d no cluster)", worker, len(self.workers))
+
+    # Remove workers sem heartbeat recente
+    def expire(self):
+        now = time.monotonic()
+        with self.lock:
+            stale = [w for w, info in self.workers.items() if now - info["last_seen"] > WORKER_TIMEOUT]
+        for worker in stale:
+            logger.warning("Worker %s sem heartbeat há mais de %.0fs", worker, WORKER_TIMEOUT)
+            self.leave(worker)
+
+    # Fila somada dos agendadores dos workers (mesmo formato do monitor local)
+    def queue(self):
+        with self.lock:
+            total = {"scheduled": 0, "overdue": 0, "in_progress": 0}
+            for info in self.workers.values():
+                for key, value in (info["queue"] or {}).items():
+                    if key in total:
+                        total[key] += value
+            return total
+
+    def publish(self, now):
+        names = [s["nome"] for s in self._current_servers()]
+        self.store.close_removed(names)
+        self.state.publish(names, now, self.queue())
+        self.published_at = time.monotonic()
+
+    # Aplica os resultados de um worker: [{nome, probe, latency, trace}]
+    def ingest(self, worker, results):
+        by_name = {s["nome"]: s for s in self._current_servers()}
+        servidores, resultados = [], []
+        for result in results:
+            servidor = by_name.get(result.get("nome"))
+            if servidor is None:
+                continue
+            servidores.append(servidor)
+            resultados.append((tuple(result["probe"]), result.get("latency"), result.get("trace")))
+        if not servidores:
+            return 0
+        with self.ingest_lock:
+            _, samples = apply_results(servidores, resultados, self.dispatcher, self.state, via=worker)
+            now = datetime.now(TZ)
+            record_history(self.store, samples, now, self.state)
+            self.publish(now)
+        return len(servidores)
+
+    def status(self):
+        with self.lock:
+            now = time.monotonic()
+            counts = {}
+            for s in self.servers:
+                for owner in self.ring.owners_of(s["nome"], CLUSTER_REPLICAS):
+                    counts[owner] = counts.get(owner, 0) + 1
+            return {"epoch": self.epoch, "workers": {
+                w: {"servers": counts.get(w, 0), "last_seen": round(now - info["last_seen"], 1),
+                    "queue": info["queue"]} for w, info in self.workers.items()}}
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if CLUSTER_TOKEN and self.headers.get("X-Cluster-Token") != CLUSTER_TOKEN:
+            self._reply(403, {"erro": "token inválido"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/status":
+            self._reply(200, self.server.aggregator.status())
+        else:
+            self._reply(404, {"erro": "não encontrado"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            worker = str(data["worker"])
+        except (ValueError, KeyError):
+            self._reply(400, {"erro": "requisição inválida"})
+            return
+        aggregator = self.server.aggregator
+        if self.path == "/heartbeat":
+            self._reply(200, aggregator.heartbeat(worker, data.get("queue")))
+        elif self.path == "/results":
+            self._reply(200, {"aceitos": aggregator.ingest(worker, data.get("results", []))})
+        elif self.path == "/leave":
+            aggregator.leave(worker)
+            self._reply(200, {})
+        else:
+            self._reply(404, {"erro": "não encontrado"})
+
+# Inicia o servidor HTTP do agregador numa thread
+def start_aggregator_server(aggregator, port=CLUSTER_PORT, addr=CLUSTER_ADDR):
+    server = ThreadingHTTPServer((addr, port), _Handler)
+    server.daemon_threads = True
+    server.aggregator = aggregator
+    threading.Thread(target=server.serve_forever, name="agregador", daemon=True).start()
+    logger.info("Agregador em http://%s:%d", addr, server.server_address[1])
+    return server
+
+# --- Worker ---
+class Worker:
+    """Verifica a parte da lista atribuída pelo agregador e envia os resultados."""
+
+    def __init__(self, url, worker_id=None, interval=REFRESH_INTERVAL):
+        self.url = url.rstrip("/")
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.scheduler = ProbeScheduler(interval)
+        self.session = requests.Session()
+        if CLUSTER_TOKEN:
+            self.session.headers["X-Cluster-Token"] = CLUSTER_TOKEN
+        self.last_online = {}
+        self.epoch = None
+
+    def _post(self, path, data):
+        response = self.session.post(f"{self.url}{path}", json=dict(data, worker=self.id), timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    # Heartbeat numa thread própria: verificações lentas não tiram o worker do anel
+    def _heartbeats(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                reply = self._post("/heartbeat", {"queue": self.scheduler.stats(time.time())})
+                # Provedores (canário) calculados só com os servidores desta parte
+                if any(self.scheduler.sync(reply["servers"], time.time())) or reply["epoch"] != self.epoch:
+                    provider_groups.update(reply["servers"])
+                if reply["epoch"] != self.epoch:
+                    logger.info("Parte do worker %s: %d servidores (época %s)",
+                                self.id, len(reply["servers"]), reply["epoch"])
+                    self.epoch = reply["epoch"]
+            except (requests.RequestException, ValueError, KeyError) as e:
+                logger.warning("Agregador indisponível: %s", e)
+            stop_event.wait(HEARTBEAT_INTERVAL)
+
+    def _send(self, due, resultados):
+        payload = []
+        for servidor, resultado in zip(due, resultados):
+            if resultado is None:
+                continue
+            probe, latency, trace = resultado
+            payload.append({"nome": servidor["nome"], "probe": list(probe), "latency": latency, "trace": trace})
+        self._post("/results", {"results": payload})
+        now = time.time()
+        for servidor, resultado in zip(due, resultados):
+            online = resultado is not None and "Online" in resultado[0][0]
+            changed = self.last_online.get(servidor["nome"]) != online
+            self.last_online[servidor["nome"]] = online
+            self.scheduler.record(servidor["nome"], online, changed, now)
+
+    def run(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        threading.Thread(target=self._heartbeats, args=(stop_event,), name="heartbeat", daemon=True).start()
+        # Como o monitor: vencidos entram no motor na hora e cada resultado é enviado
+        # assim que fica pronto, sem esperar o restante do lote
+        probes = ContinuousProbes()
+        try:
+            while not stop_event.is_set():
+                probes.submit(self.scheduler.pop_due(time.time()))
+                wait = self.scheduler.next_due_in(time.time())
+                wait = min(wait if wait is not None else 1.0, 1.0)
+                if not len(probes):
+                    stop_event.wait(wait)
+                    continue
+                done = probes.collect(wait)
+                if not done:
+                    continue
+                due = [servidor for servidor, _ in done]
+                try:
+                    self._send(due, [resultado for _, resultado in done])
+                except requests.RequestException as e:
+                    logger.warning("Falha ao enviar resultados ao agregador: %s", e)
+                    for servidor in due:
+                        self.scheduler.record(servidor["nome"], False, True, time.time())
+        finally:
+            probes.shutdown()
+            stop_event.set()
+            try:
+                self._post("/leave", {})
+            except requests.RequestException:
+                pass
@@ -0,0 +1,44 @@
+# Configurações compartilhadas entre o painel (Streamlit) e o monitor em segundo plano
+# Segredos e parâmetros são lidos das variáveis de ambiente
+import os
+import ast
+import pytz
+
+TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
+TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+SERVIDOR_URLS = ast.literal_eval(os.environ.get("SERVIDOR_URLS", "{}"))
+PASSWORD = os.environ.get("SENHA", "iptv2024")
+
+EMAIL_USER = os.environ.get("EMAIL_USER")
+EMAIL_PASS = os.environ.get("EMAIL_PASS")
+# Permitir múltiplos destinatários de e-mail
+EMAIL_TO = os.environ.get("EMAIL_TO", "").split(",") if os.environ.get("EMAIL_TO") else []
+
+# Corrigir timezone para GMT-3 (America/Sao_Paulo) usando pytz
+TZ = pytz.timezone('America/Sao_Paulo')
+
+# Arquivos compartilhados entre o monitor e o painel
+# Histórico antigo em JSON (migrado automaticamente para o banco SQLite)
+HISTORY_FILE = os.environ.get("HISTORY_FILE", "historico_uptime.json")
+HISTORY_DB = os.environ.get("HISTORY_DB", "historico_uptime.db")
+# Dias de histórico mantidos no banco (o relatório mensal precisa de 30)
+HISTORY_RETENTION_DAYS = float(os.environ.get("HISTORY_RETENTION_DAYS", "30"))
+# Estado compartilhado do monitor (status, última tabela, alertas); vazio = só em memória
+STATE_DB = os.environ.get("STATE_DB", "estado_monitor.db")
+# Cadastro de servidores (server_registry); SERVIDOR_URLS e o arquivo antigo de
+# servidores personalizados só semeiam o cadastro na primeira execução
+REGISTRY_DB = os.environ.get("REGISTRY_DB", "servidores.db")
+CUSTOM_SERVERS_FILE = os.environ.get("CUSTOM_SERVERS_FILE", "servidores_custom.json")
+
+# Intervalo entre as verificações do monitor (segundos)
+REFRESH_INTERVAL = int(os.environ.get("REFRESH_INTERVAL", "60"))
+# "1" inicia o monitor dentro do processo do Streamlit (uma única thread por processo)
+MONITOR_EMBEDDED = os.environ.get("MONITOR_EMBEDDED", "0") == "1"
+
+# Quórum de alertas: o servidor só é declarado OFFLINE quando ALERT_QUORUM das últimas
+# ALERT_WINDOW verificações falham (de agentes diferentes no cluster, ou seguidas num
+# monitor único) e só volta a ONLINE após ALERT_RECOVER sucessos seguidos.
+# ALERT_WINDOW=1, ALERT_QUORUM=1 e ALERT_RECOVER=1 reproduzem o alerta imediato.
+ALERT_WINDOW = max(1, int(os.environ.get("ALERT_WINDOW", "3")))
+ALERT_QUORUM = min(max(1, int(os.environ.get("ALERT_QUORUM", "2"))), ALERT_WINDOW)
+ALERT_RECOVER = min(max(1, int(os.environ.get("ALERT_RECOVER", "2"))), ALERT_WINDOW)
@@ -0,0 +1,178 @@
+# Fazenda de servidores IPTV falsos em localhost, usada pelo benchmark (benchmark.py)
+# Um único servidor HTTP atende N "provedores" espalhados por endereços 127.x.y.z.
+# Cada provedor tem um comportamento:
+#   ok      playlist master -> playlist de mídia -> segmentos .ts
+#   lento   corpo entregue a conta-gotas
+#   html    página de erro HTML com status 200
+#   timeout demora mais que o timeout das verificações para responder
+#   morto   porta sem ninguém escutando (conexão recusada)
+# Uso avulso: python -m fake_farm --servidores 100 --porta 8000
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import ipaddress
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODES = ("ok", "lento", "html", "timeout", "morto")
+
+DEFAULTS = {
+    "latency": 0.02,        # atraso médio antes dos cabeçalhos (s), ±50%
+    "drip_seconds": 3.0,    # duração do corpo "lento"
+    "hang_seconds": 60.0,   # atraso do modo "timeout"
+    "segment_kb": 256,      # tamanho de cada segmento .ts
+}
+
+HTML_PAGE = b"<html><head><title>Erro</title></head><body><h1>Servico indisponivel</h1></body></html>"
+
+# Comportamento de cada um dos `n` provedores, com as frações pedidas (determinístico)
+def plan(n, mortos=0.0, lentos=0.0, html=0.0, timeouts=0.0, seed=42):
+    modes = []
+    for mode, fraction in (("morto", mortos), ("lento", lentos), ("html", html), ("timeout", timeouts)):
+        modes += [mode] * int(round(n * fraction))
+    modes = modes[:n] + ["ok"] * max(0, n - len(modes))
+    random.Random(seed).shuffle(modes)
+    return modes
+
+# Endereço de loopback do provedor `i` (127.0.0.1 .. 127.x.y.z)
+def host_for(i, hosts):
+    return str(ipaddress.IPv4Address("127.0.0.1") + (i % max(1, hosts)))
+
+# Lista de servidores no formato de load_servers()
+def servers(modes, port, dead_port, hosts=100):
+    result = []
+    for i, mode in enumerate(modes):
+        host = host_for(i, hosts)
+        if mode == "morto":
+            url = f"http://{host}:{dead_port}/live/{i}/master.m3u8"
+        else:
+            url = f"http://{host}:{port}/{mode}/{i}/master.m3u8"
+        result.append({"nome": f"fake-{i:05d}-{mode}", "url": url})
+    return result
+
+class FarmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Aceita apenas clientes locais (o servidor escuta em todos os endereços 127.x)
+        if not self.client_address[0].startswith("127."):
+            self.send_error(403)
+            return
+        settings = self.server.settings
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] not in MODES:
+            self.send_error(404)
+            return
+        mode, ident, name = parts
+        time.sleep(settings["latency"] * random.uniform(0.5, 1.5))
+
+        if mode == "timeout":
+            time.sleep(settings["hang_seconds"])
+        if mode == "html":
+            self._send(200, "text/html; charset=utf-8", HTML_PAGE)
+        elif name == "master.m3u8":
+            body = ("#EXTM3U\n"
+                    "#EXT-X-STREAM-INF:BANDWIDTH=800000\nmedia.m3u8\n"
+                    "#EXT-X-STREAM-INF:BANDWIDTH=2500000\nmedia.m3u8\n")
+            self._send(200, "application/vnd.apple.mpegurl", body.encode())
+        elif name == "media.m3u8":
+            sequence = int(time.time() // 6)
+            body = f"#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n"
+            body += "".join(f"#EXTINF:6.0,\nseg{sequence + k}.ts\n" for k in range(3))
+            self._send(200, "application/vnd.apple.mpegurl", body.encode())
+        elif name.endswith(".ts"):
+            self._segment(mode, settings)
+        else:
+            self.send_error(404)
+
+    def _segment(self, mode, settings):
+        packet = b"\x47" + b"\xff" * 187
+        if mode != "lento":
+            self._send(200, "video/mp2t", packet * (settings["segment_kb"] * 1024 // 188))
+            return
+        # Conta-gotas: 10 pacotes TS por segundo durante drip_seconds
+        steps = max(1, int(settings["drip_seconds"] * 10))
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.send_header("Content-Length", str(len(packet) * steps))
+        self.end_headers()
+        for _ in range(steps):
+            self.wfile.write(packet)
+            self.wfile.flush()
+            time.sleep(0.1)
+
+class FarmServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    # Clientes que fecham a conexão no meio do corpo (timeout, limite de leitura) são esperados
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+def _raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+def serve(port, settings, ready=None):
+    _raise_fd_limit()
+    # Escuta em todos os endereços para atender 127.0.0.1 .. 127.x.y.z
+    server = FarmServer(("0.0.0.0", port), FarmHandler)
+    server.settings = dict(DEFAULTS, **settings)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+# Porta livre onde nada escuta, para os provedores "mortos"
+def dead_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Inicia a fazenda num processo separado (sua CPU não entra na medição do monitor)
+# Retorna (processo, porta)
+def start_farm(port=0, **settings):
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(port, settings, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidores IPTV falsos para testes de carga")
+    parser.add_argument("--servidores", type=int, default=100)
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--hosts", type=int, default=100, help="endereços 127.x distintos")
+    parser.add_argument("--latencia", type=float, default=DEFAULTS["latency"])
+    parser.add_argument("--mortos", type=float, default=0.05)
+    parser.add_argument("--lentos", type=float, default=0.05)
+    parser.add_argument("--html", type=float, default=0.05)
+    parser.add_argument("--timeouts", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    modes = plan(args.servidores, args.mortos, args.lentos, args.html, args.timeouts)
+    # Lista pronta para python -m server_registry importar
+    json.dump(servers(modes, args.porta, dead_port(), args.hosts), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    serve(args.porta, {"latency": args.latencia})
+
+if __name__ == "__main__":
+    main()
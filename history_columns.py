@@ -0,0 +1,169 @@
+# Histórico recente em colunas NumPy para os gráficos do painel
+# ts int64 (epoch), servidor int32 (código de categoria), online uint8 e tempos
+# (resposta, latência, TTFB) float32, em ordem de tempo. As colunas crescem no próprio lugar (capacidade
+# dobrada) e são sincronizadas com o banco só com as amostras novas; janelas de
+# tempo são busca binária e o uptime por servidor é um np.bincount.
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import TZ
+from history_store import from_epoch
+
+# Dias de histórico mantidos em memória pelo painel (períodos maiores usam os agregados)
+HISTORY_MEMORY_DAYS = float(os.environ.get("HISTORY_MEMORY_DAYS", "2"))
+
+class HistoryView:
+    """Fatia imutável das colunas; segura para leitura enquanto o histórico cresce."""
+
+    def __init__(self, names, ts, server, online, response_time, latency, ttfb):
+        self.names = names
+        self.ts = ts
+        self.server = server
+        self.online = online
+        self.response_time = response_time
+        self.latency = latency
+        self.ttfb = ttfb
+
+    def __len__(self):
+        return len(self.ts)
+
+    # Amostras com start <= ts < end (epoch), sem cópia
+    def window(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start, side="left"))
+        hi = len(self.ts) if end is None else int(np.searchsorted(self.ts, end, side="left"))
+        return HistoryView(self.names, self.ts[lo:hi], self.server[lo:hi], self.online[lo:hi],
+                           self.response_time[lo:hi], self.latency[lo:hi], self.ttfb[lo:hi])
+
+    # Uptime (%), verificações e tempo médio de resposta por servidor
+    def uptime(self):
+        n = len(self.names)
+        total = np.bincount(self.server, minlength=n)
+        online = np.bincount(self.server, weights=self.online, minlength=n)
+        valid = ~np.isnan(self.response_time)
+        rt_count = np.bincount(self.server[valid], minlength=n)
+        rt_sum = np.bincount(self.server[valid], weights=self.response_time[valid], minlength=n)
+        present = total > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frame = pd.DataFrame({
+                "uptime": np.round(online / total * 100, 2),
+                "verificacoes": total,
+                "tempo_medio": np.where(rt_count > 0, rt_sum / rt_count, np.nan),
+            }, index=pd.Index(self.names, name="servidor"))
+        return frame[present]
+
+    # Só as amostras dos servidores em `names`
+    def select(self, names):
+        names = set(names)
+        codes = [i for i, name in enumerate(self.names) if name in names]
+        mask = np.isin(self.server, codes)
+        return HistoryView(self.names, self.ts[mask], self.server[mask], self.online[mask],
+                           self.response_time[mask], self.latency[mask], self.ttfb[mask])
+
+    # Proporção geral de verificações online (%)
+    def overall_uptime(self):
+        return float(self.online.mean() * 100) if len(self.online) else 0.0
+
+    # Formato longo com o servidor como categoria (para gráficos de série temporal)
+    def frame(self):
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(self.ts, unit="s", utc=True).tz_convert(TZ),
+            "servidor": pd.Categorical.from_codes(self.server, categories=self.names),
+            "online": self.online.astype(bool),
+            "tempo_resposta": self.response_time,
+            "latencia": self.latency,
+            "ttfb": self.ttfb,
+        })
+
+class HistoryColumns:
+    """Colunas do histórico em memória, compartilhadas pelas sessões do painel."""
+
+    def __init__(self, days=HISTORY_MEMORY_DAYS, capacity=4096):
+        self.days = days
+        self.lock = threading.Lock()
+        self.names = []
+        self.codes = {}
+        self.size = 0
+        # Última linha do banco já carregada (rowid de samples)
+        self.last_rowid = None
+        self.ts = np.empty(capacity, np.int64)
+        self.server = np.empty(capacity, np.int32)
+        self.online = np.empty(capacity, np.uint8)
+        self.response_time = np.empty(capacity, np.float32)
+        self.latency = np.empty(capacity, np.float32)
+        self.ttfb = np.empty(capacity, np.float32)
+
+    def _code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    # Novas colunas (maiores ou recortadas) a partir de `start`; leitores antigos mantêm as suas
+    def _resize(self, capacity, start=0):
+        kept = self.size - start
+        for attr in ("ts", "server", "online", "response_time", "latency", "ttfb"):
+            old = getattr(self, attr)
+            new = np.empty(max(capacity, kept), old.dtype)
+            new[:kept] = old[start:self.size]
+            setattr(self, attr, new)
+        self.size = kept
+
+    # Acrescenta amostras em ordem de tempo: [(ts, nome, online, tempo_resposta, latencia, ttfb)]
+    def append(self, rows):
+        if not rows:
+            return
+        n = len(rows)
+        if self.size + n > len(self.ts):
+            self._resize(max(len(self.ts) * 2, self.size + n))
+        ts, names, online, rt, lat, ttfb = zip(*rows)
+        end = self.size + n
+        self.ts[self.size:end] = ts
+        self.server[self.size:end] = [self._code(name) for name in names]
+        self.online[self.size:end] = online
+        self.response_time[self.size:end] = np.array(rt, dtype=np.float64)
+        self.latency[self.size:end] = np.array(lat, dtype=np.float64)
+        self.ttfb[self.size:end] = np.array(ttfb, dtype=np.float64)
+        self.size = end
+
+    # Linhas de samples_since: guarda o maior rowid e acrescenta as que estão na janela
+    def _append_rows(self, rows, start):
+        if not rows:
+            return
+        last = max(row[0] for row in rows)
+        self.last_rowid = last if self.last_rowid is None else max(self.last_rowid, last)
+        self.append([row[1:] for row in rows if row[1] >= start])
+
+    # Lê do banco apenas as amostras gravadas depois da última carregada (pelo rowid:
+    # gravações no mesmo segundo têm o mesmo ts) e descarta as anteriores à janela em memória
+    def sync(self, store, now_ts):
+        with self.lock:
+            start = now_ts - int(self.days * 86400)
+            batch = []
+            for row in store.samples_since(self.last_rowid, from_epoch(start)):
+                batch.append(row)
+                if len(batch) >= 50000:
+                    self._append_rows(batch, start)
+                    batch = []
+            self._append_rows(batch, start)
+            cutoff = int(np.searchsorted(self.ts[:self.size], now_ts - int(self.days * 86400)))
+            # Recorta só quando há bastante amostra vencida, para não copiar a cada sincronização
+            if cutoff > self.size // 4:
+                self._resize(len(self.ts), cutoff)
+            return self._view()
+
+    def _view(self):
+        return HistoryView(list(self.names), self.ts[:self.size], self.server[:self.size],
+                           self.online[:self.size], self.response_time[:self.size],
+                           self.latency[:self.size], self.ttfb[:self.size])
+
+    def view(self):
+        with self.lock:
+            return self._view()
+
+    # Se o período a partir de `start_ts` (epoch) está todo em memória
+    def covers(self, start_ts, now_ts):
+        return start_ts >= now_ts - int(self.days * 86400)
@@ -0,0 +1,238 @@
+# Armazenamento do histórico de verificações em SQLite (somente acréscimo)
+# Uma linha por (instante, servidor, status, tempo de resposta, latência, TTFB), com
+# índices por tempo para consultas por período e limpeza por retenção.
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import TZ, HISTORY_DB, HISTORY_FILE, HISTORY_RETENTION_DAYS
+from rollups import Rollups
+from sketches import Sketches
+from incidents import Incidents, summarize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    ts INTEGER NOT NULL,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    online INTEGER NOT NULL,
+    response_time REAL,
+    latency REAL,
+    ttfb REAL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples(ts);
+CREATE INDEX IF NOT EXISTS idx_samples_server_ts ON samples(server_id, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Quantidade de linhas lidas do banco por vez nas consultas
+CHUNK_SIZE = 5000
+
+def to_epoch(dt):
+    return int(dt.timestamp())
+
+def from_epoch(ts):
+    return datetime.fromtimestamp(ts, TZ)
+
+class HistoryStore:
+    """Histórico de verificações; seguro para uso a partir de várias threads."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._server_ids = {}
+        with self.conn:
+            # Bancos anteriores à coluna de TTFB
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(samples)")]
+            if "ttfb" not in columns:
+                self.conn.execute("ALTER TABLE samples ADD COLUMN ttfb REAL")
+            self.rollups = Rollups(self.conn)
+            self.sketches = Sketches(self.conn)
+            has_samples = self.conn.execute("SELECT 1 FROM samples LIMIT 1").fetchone()
+            if has_samples and not self.conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone():
+                self.rollups.rebuild()
+            if has_samples and not self.conn.execute("SELECT 1 FROM sketches LIMIT 1").fetchone():
+                self.sketches.rebuild()
+            # Bancos anteriores aos intervalos de incidente
+            self.incidents = Incidents(self.conn)
+            if not self.conn.execute("SELECT 1 FROM meta WHERE key = 'incidents_built'").fetchone():
+                self.incidents.rebuild()
+                self.conn.execute("INSERT INTO meta(key, value) VALUES ('incidents_built', '1')")
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+    # Grava os esboços da hora corrente ainda em memória (sketches.Sketches)
+    def flush(self):
+        with self.lock, self.conn:
+            self.sketches.flush()
+
+    def _server_id(self, name):
+        server_id = self._server_ids.get(name)
+        if server_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO servers(name) VALUES (?)", (name,))
+            server_id = self.conn.execute("SELECT id FROM servers WHERE name = ?", (name,)).fetchone()[0]
+            self._server_ids[name] = server_id
+        return server_id
+
+    # Acrescenta uma verificação:
+    # samples = [(nome, online, tempo_resposta, latencia, ttfb, classe do erro, erro), ...]
+    # Tempos de resposta e TTFB em segundos, latência em ms; o erro só vale para offline
+    def append(self, ts, samples):
+        ts = to_epoch(ts) if isinstance(ts, datetime) else int(ts)
+        with self.lock, self.conn:
+            rows, errors = [], []
+            for nome, online, response_time, latency, ttfb, error_class, error in samples:
+                server_id = self._server_id(nome)
+                rows.append((ts, server_id, int(bool(online)), response_time, latency, ttfb))
+                errors.append((server_id, bool(online), error_class, error))
+            self.conn.executemany(
+                "INSERT INTO samples(ts, server_id, online, response_time, latency, ttfb) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.rollups.add(ts, [(server_id, online, response_time)
+                                  for _, server_id, online, response_time, _, _ in rows])
+            self.sketches.add(ts, [(server_id, response_time, ttfb, latency)
+                                   for _, server_id, _, response_time, latency, ttfb in rows])
+            self.incidents.add(ts, errors)
+
+    # Percorre as amostras em ordem de tempo, lendo o banco em blocos
+    # Retorna tuplas (ts, nome, online, tempo_resposta, latencia, ttfb)
+    def query(self, start=None, end=None):
+        sql = ("SELECT s.ts, v.name, s.online, s.response_time, s.latency, s.ttfb "
+               "FROM samples s JOIN servers v ON v.id = s.server_id WHERE s.ts >= ? AND s.ts < ? ORDER BY s.ts")
+        params = (to_epoch(start) if start is not None else 0,
+                  to_epoch(end) if end is not None else 2**62)
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            rows = cursor.fetchmany(CHUNK_SIZE)
+        while rows:
+            yield from rows
+            with self.lock:
+                rows = cursor.fetchmany(CHUNK_SIZE)
+
+    # Amostras gravadas depois da linha `after` (rowid), na ordem de gravação; sem `after`,
+    # todas a partir de `start` em ordem de tempo. Várias gravações podem ter o mesmo `ts`
+    # (segundos inteiros), por isso a leitura incremental usa o rowid e não o tempo.
+    # Retorna (rowid, ts, nome, online, tempo_resposta, latencia, ttfb)
+    def samples_since(self, after=None, start=None):
+        columns = "s.rowid, s.ts, v.name, s.online, s.response_time, s.latency, s.ttfb"
+        if after is None:
+            sql = (f"SELECT {columns} FROM samples s JOIN servers v ON v.id = s.server_id "
+                   "WHERE s.ts >= ? ORDER BY s.ts")
+            params = (to_epoch(start) if start is not None else 0,)
+        else:
+            sql = (f"SELECT {columns} FROM samples s JOIN servers v ON v.id = s.server_id "
+                   "WHERE s.rowid > ? ORDER BY s.rowid")
+            params = (after,)
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            rows = cursor.fetchmany(CHUNK_SIZE)
+        while rows:
+            yield from rows
+            with self.lock:
+                rows = cursor.fetchmany(CHUNK_SIZE)
+
+    # Histórico no formato usado pelo painel: [{'timestamp': datetime, 'status': {nome: bool}}]
+    def snapshots(self, start=None, end=None):
+        history = []
+        for ts, nome, online, _, _, _ in self.query(start, end):
+            if not history or history[-1]['ts'] != ts:
+                history.append({'ts': ts, 'timestamp': from_epoch(ts), 'status': {}})
+            history[-1]['status'][nome] = bool(online)
+        return history
+
+    # Uptime, incidentes e tempo de resposta por servidor a partir dos agregados
+    def totals(self, start, end=None):
+        end = end or datetime.now(TZ)
+        with self.lock:
+            return self.rollups.totals(to_epoch(start), to_epoch(end))
+
+    # Esboços de quantis por hora de uma métrica ("response_time", "ttfb" ou "latency")
+    # Retorna {nome: [(balde, QuantileSketch)]}
+    def sketch_series(self, metric, start, end=None, names=None):
+        end = end or datetime.now(TZ)
+        with self.lock:
+            # Esboços deste processo ainda não gravados entram na consulta
+            if self.sketches.dirty:
+                with self.conn:
+                    self.sketches.flush()
+            return self.sketches.series(metric, to_epoch(start), to_epoch(end), names)
+
+    # Quedas que se sobrepõem ao período: [(nome, início, fim ou None, classe, erro)] em epochs
+    def incident_intervals(self, start, end=None, names=None):
+        end = end or datetime.now(TZ)
+        with self.lock:
+            return self.incidents.intervals(to_epoch(start), to_epoch(end), names)
+
+    # Fecha as quedas em andamento de servidores que saíram do cadastro (`names` = ativos)
+    def close_removed(self, names):
+        with self.lock, self.conn:
+            return self.incidents.close_removed(set(names))
+
+    # SLA, MTTR, MTBF, incidentes e maior queda por servidor, a partir dos intervalos
+    def incident_report(self, start, end=None):
+        now = to_epoch(datetime.now(TZ))
+        end = to_epoch(end) if end is not None else now
+        with self.lock:
+            intervals = self.incidents.intervals(to_epoch(start), end)
+            observed = self.incidents.observed()
+        return summarize(intervals, observed, to_epoch(start), end, now)
+
+    def last_timestamp(self):
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(ts) FROM samples").fetchone()
+        return row[0]
+
+    # Remove amostras mais antigas que a retenção e devolve o espaço ao sistema
+    def compact(self, retention_days=HISTORY_RETENTION_DAYS, now=None):
+        now = now or datetime.now(TZ)
+        cutoff = to_epoch(now) - int(retention_days * 86400)
+        with self.lock:
+            with self.conn:
+                removed = self.conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,)).rowcount
+                self.rollups.compact(to_epoch(now))
+                self.sketches.compact(to_epoch(now))
+                self.incidents.compact(to_epoch(now))
+            self.conn.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    # Migração única do antigo historico_uptime.json; o arquivo é renomeado depois
+    def migrate_json(self, path=HISTORY_FILE):
+        if not os.path.exists(path):
+            return 0
+        with self.lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done:
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        count = 0
+        with self.lock, self.conn:
+            for h in data:
+                ts = to_epoch(TZ.localize(datetime.strptime(h['timestamp'], '%Y-%m-%d %H:%M:%S')))
+                rows = [(ts, self._server_id(nome), int(bool(online)), None, None)
+                        for nome, online in h['status'].items()]
+                self.conn.executemany(
+                    "INSERT INTO samples(ts, server_id, online, response_time, latency) VALUES (?, ?, ?, ?, ?)", rows)
+                count += len(rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('json_migrated', ?)", (path,))
+            self.rollups.rebuild()
+            self.sketches.rebuild()
+            self.incidents.rebuild()
+        os.replace(path, f"{path}.migrado")
+        return count
@@ -0,0 +1,217 @@
+# Sessões HTTP compartilhadas para as verificações
+# Uma requests.Session por host (mesmo esquema, host e porta), com keep-alive e
+# reaproveitamento de conexões; o total de hosts mantidos é limitado (LRU).
+# As conexões medem o tempo de DNS, conexão TCP e TLS de cada verificação (metrics).
+# Opcionalmente mantém um cache de DNS com tempo de validade.
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError, NewConnectionError, ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+from metrics import add_phase
+
+# Quantidade máxima de hosts com sessão aberta ao mesmo tempo
+POOL_MAX_HOSTS = int(os.environ.get("POOL_MAX_HOSTS", "256"))
+# Validade do cache de DNS em segundos (0 desativa)
+DNS_CACHE_TTL = float(os.environ.get("DNS_CACHE_TTL", "0"))
+# Tamanho máximo (Content-Length) de uma resposta lida até o fim para devolver a
+# conexão ao pool; respostas maiores ou sem tamanho (streams contínuos) são fechadas
+DRAIN_LIMIT = 256 * 1024
+
+# Conexão que resolve o host pelo dns_cache (fase "dns") e registra a fase "connect"
+# (handshake TCP, sem o DNS). Tenta os endereços em ordem, como o urllib3; o nome
+# original continua valendo para SNI e verificação do certificado
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        started = time.perf_counter()
+        host = self._dns_host
+        try:
+            addresses = dns_cache.resolve(host.strip("[]"), self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        connecting = time.perf_counter()
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            raise error or NewConnectionError(self, "getaddrinfo returns an empty list")
+        finally:
+            self._dns_host = host
+            self._new_conn_seconds = time.perf_counter() - started
+            add_phase("connect", time.perf_counter() - connecting)
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+# Além do TCP, registra a fase "tls" (handshake TLS)
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        self._new_conn_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_phase("tls", max(0.0, time.perf_counter() - started - self._new_conn_seconds))
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+class SessionPool:
+    """Sessões por host com limite total; segura para uso a partir de várias threads."""
+
+    def __init__(self, headers=None, max_hosts=POOL_MAX_HOSTS, max_per_host=4):
+        self.headers = headers or {}
+        self.max_hosts = max_hosts
+        self.max_per_host = max_per_host
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()
+        self.stats = {"session_hits": 0, "session_misses": 0, "evictions": 0,
+                      "closed_requests": 0, "closed_connections": 0}
+
+    def _new_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_host, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    # Sessão do host da URL (criada na primeira vez, reaproveitada depois)
+    def get(self, url):
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+                self.stats["session_hits"] += 1
+                return session
+            self.stats["session_misses"] += 1
+            session = self.sessions[key] = self._new_session()
+            while len(self.sessions) > self.max_hosts:
+                _, old = self.sessions.popitem(last=False)
+                self._retire(old)
+                self.stats["evictions"] += 1
+            return session
+
+    # Guarda os contadores da sessão removida antes de fechá-la
+    def _retire(self, session):
+        requests_, connections = _connection_counts(session)
+        self.stats["closed_requests"] += requests_
+        self.stats["closed_connections"] += connections
+        session.close()
+
+    # Conexões: "hits" são requisições que reaproveitaram uma conexão aberta
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            total_requests = stats.pop("closed_requests")
+            total_connections = stats.pop("closed_connections")
+            for session in self.sessions.values():
+                requests_, connections = _connection_counts(session)
+                total_requests += requests_
+                total_connections += connections
+            stats["hosts"] = len(self.sessions)
+        stats["connection_misses"] = total_connections
+        stats["connection_hits"] = max(0, total_requests - total_connections)
+        stats.update(dns_cache.snapshot())
+        return stats
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+def _connection_counts(session):
+    requests_ = connections = 0
+    for adapter in set(session.adapters.values()):
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                requests_ += pool.num_requests
+                connections += pool.num_connections
+    return requests_, connections
+
+# Encerra a resposta de forma que a conexão volte ao pool quando possível
+# Só esvazia respostas com Content-Length até DRAIN_LIMIT; as demais (streams ao vivo,
+# chunked) nunca voltariam ao pool e são fechadas na hora
+def release(response):
+    try:
+        length = int(response.headers.get("Content-Length", ""))
+    except ValueError:
+        length = None
+    try:
+        if length is not None and length <= DRAIN_LIMIT:
+            for _ in response.iter_content(chunk_size=16384):
+                pass
+    except Exception:
+        pass
+    finally:
+        response.close()
+
+class DnsCache:
+    """Resolve os hosts das conexões do pool: mede a fase "dns" e, com TTL, guarda o resultado.
+
+    Não altera socket.getaddrinfo: as demais bibliotecas do processo não são afetadas.
+    """
+
+    def __init__(self, ttl=0):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.ttl = max(0, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    # Endereços IP de `host` (ordem do getaddrinfo, sem repetição)
+    def resolve(self, host, port):
+        family = allowed_gai_family()
+        key = (host, port, family)
+        now = time.monotonic()
+        if self.ttl:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+        started = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        finally:
+            add_phase("dns", time.perf_counter() - started)
+        result = list(dict.fromkeys(info[4][0] for info in infos))
+        if self.ttl:
+            with self.lock:
+                if len(self.entries) >= 4096:
+                    self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+                self.entries[key] = (now + self.ttl, result)
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            return {"dns_hits": self.hits, "dns_misses": self.misses} if self.ttl else {}
+
+dns_cache = DnsCache(DNS_CACHE_TTL)
@@ -0,0 +1,144 @@
+# Linha do tempo de incidentes: cada queda de um servidor vira um intervalo
+# [início, fim) com a classe do erro (timeout, dns, connection, http, stream, content).
+# A sequência de amostras é compactada em intervalos (codificação por carreiras):
+# uma linha por queda, independente da frequência das verificações. MTTR, MTBF,
+# SLA e a maior queda saem direto dos intervalos.
+# Início = primeira verificação offline; fim = primeira verificação online depois dela.
+
+INCIDENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    started INTEGER NOT NULL,
+    ended INTEGER,
+    error_class TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_server_started ON incidents(server_id, started);
+CREATE INDEX IF NOT EXISTS idx_incidents_started ON incidents(started);
+CREATE INDEX IF NOT EXISTS idx_incidents_ended ON incidents(ended);
+"""
+
+# Dias mantidos (contados do fim do incidente); intervalos ocupam pouco espaço
+RETENTION_DAYS = 800
+
+class Incidents:
+    """Intervalos de queda por servidor; usa a conexão e a trava do HistoryStore."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.executescript(INCIDENT_SCHEMA)
+        # Incidente em andamento de cada servidor: server_id -> id
+        self.open = dict(self.conn.execute("SELECT server_id, id FROM incidents WHERE ended IS NULL"))
+
+    # Deve ser chamado dentro da transação que grava as amostras
+    # rows = [(server_id, online, classe do erro, erro), ...]
+    def add(self, ts, rows):
+        opened, closed = [], []
+        for server_id, online, error_class, error in rows:
+            incident = self.open.get(server_id)
+            if online and incident is not None:
+                closed.append((ts, incident))
+                del self.open[server_id]
+            elif not online and incident is None:
+                opened.append((server_id, ts, error_class, error))
+        if closed:
+            self.conn.executemany("UPDATE incidents SET ended = ? WHERE id = ?", closed)
+        for params in opened:
+            cursor = self.conn.execute(
+                "INSERT INTO incidents(server_id, started, error_class, error) VALUES (?, ?, ?, ?)", params)
+            self.open[params[0]] = cursor.lastrowid
+
+    # Reconstrói os intervalos a partir das amostras (sem a classe do erro, que não é gravada nelas)
+    def rebuild(self):
+        self.conn.execute("DELETE FROM incidents")
+        self.open = {}
+        cursor = self.conn.execute("SELECT ts, server_id, online FROM samples ORDER BY ts")
+        batch_ts, batch = None, []
+        for ts, server_id, online in cursor:
+            if ts != batch_ts and batch:
+                self.add(batch_ts, batch)
+                batch = []
+            batch_ts = ts
+            batch.append((server_id, online, None, None))
+        if batch:
+            self.add(batch_ts, batch)
+
+    # Fecha as quedas em andamento de servidores fora de `names` (removidos ou desativados
+    # no cadastro) na última amostra de cada um; sem novas amostras ficariam abertas para sempre
+    def close_removed(self, names):
+        if not self.open:
+            return 0
+        ids = list(self.open)
+        rows = self.conn.execute(f"SELECT id, name FROM servers WHERE id IN ({','.join('?' for _ in ids)})", ids)
+        gone = [server_id for server_id, name in rows if name not in names]
+        for server_id in gone:
+            self.conn.execute(
+                "UPDATE incidents SET ended = COALESCE((SELECT MAX(ts) FROM samples WHERE server_id = ?), started) "
+                "WHERE id = ?", (server_id, self.open.pop(server_id)))
+        return len(gone)
+
+    def compact(self, now_ts):
+        self.conn.execute("DELETE FROM incidents WHERE ended < ?", (now_ts - RETENTION_DAYS * 86400,))
+
+    # Intervalos que se sobrepõem a [start, end), em ordem de início
+    # Retorna [(nome, início, fim ou None, classe, erro)]
+    def intervals(self, start, end, names=None):
+        sql = ("SELECT v.name, i.started, i.ended, i.error_class, i.error FROM incidents i "
+               "JOIN servers v ON v.id = i.server_id "
+               "WHERE i.started < ? AND (i.ended IS NULL OR i.ended > ?)")
+        params = [end, start]
+        if names is not None:
+            sql += f" AND v.name IN ({','.join('?' for _ in names)})"
+            params += list(names)
+        return self.conn.execute(sql + " ORDER BY i.started", params).fetchall()
+
+    # Primeira e última amostra de cada servidor (período observado, para o SLA e o MTBF)
+    # Duas buscas no índice (server_id, ts) por servidor, sem varrer as amostras
+    def observed(self):
+        rows = self.conn.execute(
+            "SELECT v.name, (SELECT MIN(ts) FROM samples WHERE server_id = v.id), "
+            "(SELECT MAX(ts) FROM samples WHERE server_id = v.id) FROM servers v")
+        return {name: (first, last) for name, first, last in rows if first is not None}
+
+# Indicadores por servidor no período [start, end); `now` limita o fim do período
+# `observed` = {nome: (primeira, última amostra)}; só entram servidores verificados no
+# período (sem queda, com 100%)
+# Retorna {nome: {sla, downtime, incidents, mttr, mtbf, longest, ongoing}} (tempos em segundos)
+def summarize(intervals, observed, start, end, now):
+    end = min(end, now)
+
+    def counters(first):
+        return {"observed": end - max(start, first), "downtime": 0, "incidents": 0,
+                "repaired": 0, "repair_seconds": 0, "longest": 0, "ongoing": False}
+
+    stats = {nome: counters(first) for nome, (first, last) in observed.items() if first < end and last >= start}
+    for nome, started, ended, _, _ in intervals:
+        s = stats.get(nome)
+        if s is None:
+            continue
+        # Queda em andamento conta até o fim do período (ou até agora)
+        finish = ended if ended is not None else end
+        s["downtime"] += max(0, min(finish, end) - max(started, start))
+        s["longest"] = max(s["longest"], finish - started)
+        if started >= start:
+            s["incidents"] += 1
+        if ended is not None and start <= ended <= end:
+            s["repaired"] += 1
+            s["repair_seconds"] += ended - started
+        if ended is None:
+            s["ongoing"] = True
+    result = {}
+    for nome, s in stats.items():
+        observed_seconds = max(s["observed"], s["downtime"], 1)
+        result[nome] = {
+            "sla": 100 * (1 - s["downtime"] / observed_seconds),
+            "downtime": s["downtime"],
+            "incidents": s["incidents"],
+            "mttr": s["repair_seconds"] / s["repaired"] if s["repaired"] else None,
+            # Tempo médio entre falhas: tempo online observado dividido pelas quedas
+            "mtbf": (observed_seconds - s["downtime"]) / s["incidents"] if s["incidents"] else None,
+            "longest": s["longest"],
+            "ongoing": s["ongoing"],
+        }
+    return result
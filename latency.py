@@ -0,0 +1,114 @@
+# Medição de latência dentro do processo (sem executar o comando ping)
+# Mede o tempo de conexão TCP na porta real da URL; opcionalmente usa ICMP
+# (socket ICMP sem privilégios no Linux ou socket raw quando executado como root).
+import os
+import time
+import struct
+import socket
+import select
+import itertools
+from urllib.parse import urlparse
+
+LATENCY_SAMPLES = int(os.environ.get("LATENCY_SAMPLES", "3"))
+LATENCY_TIMEOUT = float(os.environ.get("LATENCY_TIMEOUT", "2"))
+# "1" tenta ICMP antes do TCP (cai para TCP se o sistema não permitir)
+LATENCY_ICMP = os.environ.get("LATENCY_ICMP", "0") == "1"
+
+_icmp_ids = itertools.count(os.getpid() & 0xFFFF)
+
+def _resolve(host, port):
+    family, _, _, _, address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+    return family, address
+
+# Tempo (s) para completar o handshake TCP; o DNS fica de fora da medição
+# Uma conexão recusada (RST) também leva uma ida e volta e conta como amostra
+def tcp_rtt(family, address, timeout=LATENCY_TIMEOUT):
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        started = time.perf_counter()
+        try:
+            sock.connect(address)
+        except ConnectionRefusedError:
+            pass
+        return time.perf_counter() - started
+    finally:
+        sock.close()
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _icmp_socket():
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+# Tempo (s) de um eco ICMP (somente IPv4); levanta OSError se não houver permissão
+def icmp_rtt(address, timeout=LATENCY_TIMEOUT):
+    sock, raw = _icmp_socket()
+    try:
+        ident = next(_icmp_ids) & 0xFFFF
+        header = struct.pack("!BBHHH", 8, 0, 0, ident, 1)
+        payload = struct.pack("!d", time.perf_counter())
+        packet = struct.pack("!BBHHH", 8, 0, _checksum(header + payload), ident, 1) + payload
+        started = time.perf_counter()
+        sock.sendto(packet, (address, 0))
+        deadline = started + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                raise socket.timeout("ICMP timeout")
+            data, _ = sock.recvfrom(1024)
+            if raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            # Socket sem privilégios: o kernel troca o identificador e filtra as respostas
+            if data[0] == 0 and (not raw or struct.unpack("!H", data[4:6])[0] == ident):
+                return time.perf_counter() - started
+    finally:
+        sock.close()
+
+# Latência da URL em N amostras: {min, avg, max, jitter (ms), method, samples}
+# Retorna None se nenhuma amostra tiver sucesso
+def measure_latency(url, samples=LATENCY_SAMPLES, timeout=LATENCY_TIMEOUT, use_icmp=LATENCY_ICMP):
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        family, address = _resolve(parsed.hostname, port)
+    except (OSError, UnicodeError, TypeError):
+        return None
+
+    method = "tcp"
+    if use_icmp and family == socket.AF_INET:
+        try:
+            icmp_rtt(address[0], timeout)
+            method = "icmp"
+        except OSError:
+            pass
+
+    rtts = []
+    for _ in range(max(1, samples)):
+        try:
+            if method == "icmp":
+                rtts.append(icmp_rtt(address[0], timeout) * 1000)
+            else:
+                rtts.append(tcp_rtt(family, address, timeout) * 1000)
+        except OSError:
+            continue
+    if not rtts:
+        return None
+    # Jitter como média das diferenças entre amostras consecutivas (RFC 3550)
+    diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+    return {
+        "min": min(rtts),
+        "avg": sum(rtts) / len(rtts),
+        "max": max(rtts),
+        "jitter": sum(diffs) / len(diffs) if diffs else 0.0,
+        "method": method,
+        "samples": len(rtts),
+    }
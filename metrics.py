@@ -0,0 +1,257 @@
+# Métricas do monitor no formato OpenMetrics (Prometheus), sem dependências extras
+# Contadores, gauges e histogramas em memória, expostos em http://127.0.0.1:METRICS_PORT/metrics.
+# Cada verificação tem um "trace" por thread com o tempo de cada fase
+# (dns, connect, tls, ttfb, body, latency, total), preenchido pelos módulos de rede.
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+probe_logger = logging.getLogger("probe")
+
+# Porta do endpoint /metrics (0 desativa) e endereço de escuta (local por padrão)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "127.0.0.1")
+# "1" registra cada verificação como uma linha JSON no logger "probe"
+PROBE_LOG_JSON = os.environ.get("PROBE_LOG_JSON", "0") == "1"
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {_escape(self.help)}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self, key, value):
+        return [f"{self.name}_total{_labels(self.labelnames, key)} {_number(value)}"]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def get(self, default=None, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), default)
+
+    def remove(self, **labels):
+        with self.lock:
+            self.values.pop(self._key(labels), None)
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def _samples(self, key, value):
+        counts, count, total = value
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- Métricas do monitor ---
+PROBE_PHASE_SECONDS = registry.register(Histogram(
+    "iptv_probe_phase_seconds", "Tempo de cada fase das verificações", ["phase"]))
+PROBE_LAST_PHASE_SECONDS = registry.register(Gauge(
+    "iptv_probe_last_phase_seconds", "Tempo de cada fase na última verificação do servidor", ["server", "phase"]))
+PROBES = registry.register(Counter(
+    "iptv_probes", "Verificações concluídas por resultado", ["server", "result"]))
+PROBE_RETRIES = registry.register(Counter(
+    "iptv_probe_retries", "Retentativas de requisição", ["server"]))
+PROBE_ERRORS = registry.register(Counter(
+    "iptv_probe_errors", "Falhas de requisição classificadas (timeout, dns, connection, http, stream, content)",
+    ["server", "kind"]))
+ALERTS_SUPPRESSED = registry.register(Counter(
+    "iptv_alerts_suppressed", "Falhas que não atingiram o quórum de alerta", ["server"]))
+CYCLE_SECONDS = registry.register(Histogram(
+    "iptv_cycle_seconds", "Duração de cada rodada de verificação", buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)))
+HISTORY_WRITE_SECONDS = registry.register(Histogram(
+    "iptv_history_write_seconds", "Tempo de gravação do histórico", ["op"]))
+NOTIFICATION_SECONDS = registry.register(Histogram(
+    "iptv_notification_send_seconds", "Tempo de envio das notificações", ["channel"]))
+NOTIFICATIONS = registry.register(Counter(
+    "iptv_notifications", "Mensagens enviadas por canal e resultado", ["channel", "result"]))
+SCHEDULER_QUEUE = registry.register(Gauge(
+    "iptv_scheduler_queue", "Servidores na fila do agendador", ["state"]))
+HTTP_POOL = registry.register(Gauge(
+    "iptv_http_pool", "Contadores do pool de sessões HTTP e do cache de DNS", ["stat"]))
+
+# --- Trace por verificação (uma thread executa uma verificação por vez) ---
+_local = threading.local()
+
+def begin_trace():
+    _local.trace = {"phases": {}, "retries": 0, "errors": []}
+    return _local.trace
+
+def end_trace():
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace or {"phases": {}, "retries": 0, "errors": []}
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+# Soma `seconds` à fase no trace atual e no histograma global
+def add_phase(phase, seconds):
+    PROBE_PHASE_SECONDS.observe(seconds, phase=phase)
+    trace = current_trace()
+    if trace is not None:
+        trace["phases"][phase] = trace["phases"].get(phase, 0.0) + seconds
+
+# Tempo já acumulado numa fase do trace atual
+def phase_total(phase):
+    trace = current_trace()
+    return trace["phases"].get(phase, 0.0) if trace is not None else 0.0
+
+def note_retry():
+    trace = current_trace()
+    if trace is not None:
+        trace["retries"] += 1
+
+def note_error(kind):
+    trace = current_trace()
+    if trace is not None:
+        trace["errors"].append(kind)
+
+@contextmanager
+def timed(histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+# Publica o trace de uma verificação: contadores por servidor e, se ativado, log JSON
+def record_probe(nome, status, trace):
+    online = "Online" in status
+    PROBES.inc(server=nome, result="online" if online else "offline")
+    if trace["retries"]:
+        PROBE_RETRIES.inc(trace["retries"], server=nome)
+    for kind in trace["errors"]:
+        PROBE_ERRORS.inc(server=nome, kind=kind)
+    for phase, seconds in trace["phases"].items():
+        PROBE_LAST_PHASE_SECONDS.set(seconds, server=nome, phase=phase)
+    if PROBE_LOG_JSON:
+        probe_logger.info(json.dumps({
+            "event": "probe", "server": nome, "online": online, "status": status,
+            "phases": {k: round(v, 6) for k, v in trace["phases"].items()},
+            "retries": trace["retries"], "errors": trace["errors"],
+        }, ensure_ascii=False))
+
+# --- Endpoint HTTP ---
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+# Inicia o endpoint /metrics numa thread (uma vez por processo); retorna o servidor ou None
+def start_metrics_server(port=METRICS_PORT, addr=METRICS_ADDR):
+    global _server
+    if port <= 0 or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((addr, port), _Handler)
+    except OSError as e:
+        logger.warning("Não foi possível abrir o endpoint de métricas em %s:%d: %s", addr, port, e)
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metricas", daemon=True).start()
+    logger.info("Métricas em http://%s:%d/metrics", addr, port)
+    return _server
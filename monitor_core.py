@@ -0,0 +1,233 @@
+# Lógica de monitoramento compartilhada: verificação, alertas, histórico e relatórios
+# Não depende do Streamlit; é usada pelo monitor em segundo plano (monitor_daemon.py)
+import time
+import logging
+from datetime import datetime
+
+from config import TZ, ALERT_WINDOW, ALERT_QUORUM, ALERT_RECOVER
+from probe_engine import fetch_status, ProbeRunner, PROBE_TIMEOUT
+from latency import measure_latency
+from stream_check import DEEP_CHECK, describe
+from state_store import GLOBAL
+from server_registry import get_registry
+from providers import provider_groups
+from reports import report_runner
+from metrics import (begin_trace, end_trace, add_phase, record_probe, timed,
+                     HISTORY_WRITE_SECONDS, ALERTS_SUPPRESSED)
+
+logger = logging.getLogger(__name__)
+
+# Função para mascarar URL
+# Agora retorna sempre apenas "Oculto"
+def mask_url(url):
+    return "Oculto"
+
+# --- Lista de servidores ---
+# Servidores ativos do cadastro (server_registry); recarregada só quando o cadastro muda
+def load_servers():
+    return get_registry().servers()
+
+# --- Verificação ---
+# Janela de votos do servidor: as últimas ALERT_WINDOW verificações [agente, online]
+# Retorna o estado declarado ("online"/"offline") ou None enquanto não há quórum
+# para mudar (o estado anterior continua valendo)
+def vote(state, servidor_nome, online, vantage=None):
+    window = (state.get(servidor_nome, "window") or [])[-(ALERT_WINDOW - 1):] if ALERT_WINDOW > 1 else []
+    window.append([vantage or "", online])
+    state.set(servidor_nome, "window", window)
+    failures = sum(1 for _, ok in window if not ok)
+    if failures >= ALERT_QUORUM:
+        return "offline"
+    recent = window[-ALERT_RECOVER:]
+    if len(recent) == ALERT_RECOVER and all(ok for _, ok in recent):
+        return "online"
+    if online and state.get(servidor_nome, "status") is None:
+        return "online"
+    return None
+
+# Função para verificar uma única URL com retentativas
+# Os alertas só são enfileirados no `dispatcher` (notifier.NotificationDispatcher)
+# `state` é o StateStore compartilhado: a transição é gravada com compare-and-set,
+# então cada mudança de estado gera um único alerta
+# A transição só acontece com quórum (vote): falhas isoladas não geram alerta
+# `probe` permite reaproveitar um resultado já obtido pelo motor concorrente
+# `vantage` identifica o agente que fez a verificação (worker do cluster)
+# Com `provider_down` (provedor fora do ar), a queda entra no alerta do provedor e
+# não gera alerta individual; a volta também fica em silêncio
+def check_single_url(url, servidor_nome, dispatcher, state, probe=None, vantage=None, provider_down=None):
+    status, response_time, error_msg, details = probe if probe is not None else fetch_status(url)
+    if "Online" not in status and "Offline" not in status:
+        return status, None
+
+    online = "Online" in status
+    declared = vote(state, servidor_nome, online, vantage)
+    if declared is not None:
+        changed, last_status = state.transition(servidor_nome, "status", declared)
+    else:
+        changed, last_status = False, state.get(servidor_nome, "status")
+        if not online:
+            ALERTS_SUPPRESSED.inc(server=servidor_nome)
+    if changed and declared == "online" and last_status == "offline":
+        if state.get(servidor_nome, "provider_outage"):
+            state.set(servidor_nome, "provider_outage", None)
+        else:
+            dispatcher.notify(f"✅ Servidor <b>{servidor_nome}</b> está ONLINE novamente!")
+    elif changed and declared == "offline" and provider_down:
+        state.set(servidor_nome, "provider_outage", provider_down)
+    elif changed and declared == "offline":
+        window = state.get(servidor_nome, "window")
+        failed = [agent for agent, ok in window if not ok]
+        agents = sorted(set(a for a in failed if a))
+        where = f" ({', '.join(agents)})" if agents else ""
+        dispatcher.notify(f"❌ Servidor <b>{servidor_nome}</b> está OFFLINE!\n"
+                          f"Falhou em {len(failed)} de {len(window)} verificações{where}\nErro: {error_msg}")
+
+    if online:
+        # Vazão baixa (verificação profunda): alerta uma vez ao entrar e ao sair
+        slow = "Lento" in status
+        slow_changed, was_slow = state.transition(servidor_nome, "slow", slow)
+        if slow_changed and slow:
+            dispatcher.notify(f"🐢 Servidor <b>{servidor_nome}</b> com vazão baixa: {describe(details)}")
+        elif slow_changed and was_slow and last_status == "online":
+            dispatcher.notify(f"🚀 Servidor <b>{servidor_nome}</b> voltou à vazão normal.")
+        state.set(servidor_nome, "response_time", response_time)
+        return status, response_time
+    state.set(servidor_nome, "last_error", status)
+    return status, None
+
+# Rede (requisição + latência TCP/ICMP) roda em paralelo no motor de verificação;
+# o estado e os alertas são atualizados depois, em sequência
+# Retorna também o trace com o tempo de cada fase (metrics)
+def probe_servidor(servidor):
+    begin_trace()
+    probe_started = time.perf_counter()
+    try:
+        probe = fetch_status(servidor["url"], timeout=servidor.get("timeout") or PROBE_TIMEOUT,
+                             deep=servidor.get("deep", DEEP_CHECK))
+        started = time.perf_counter()
+        try:
+            latency = measure_latency(servidor["url"])
+        except Exception:
+            latency = None
+        add_phase("latency", time.perf_counter() - started)
+        add_phase("total", time.perf_counter() - probe_started)
+    finally:
+        trace = end_trace()
+    return probe, latency, trace
+
+# Retorna uma linha por servidor no formato da tabela do painel e as amostras
+# (nome, online, tempo de resposta, latência, TTFB, classe do erro, erro) para o histórico
+# Os provedores com canário fora do ar não são verificados (providers.ProviderGroups)
+def check_urls(servidores, dispatcher, state):
+    return apply_results(servidores, provider_groups.run(servidores, probe_servidor), dispatcher, state)
+
+# Verificação contínua (monitor e workers do cluster): servidores vencidos entram no
+# motor sem esperar os que ainda estão em andamento, e cada resultado é recolhido
+# assim que fica pronto; um servidor sem resposta não atrasa os demais
+class ContinuousProbes:
+    """ProbeRunner de longa duração com probe_servidor e o canário dos provedores."""
+
+    def __init__(self):
+        self.runner = ProbeRunner(self._probe)
+        self.ready = []     # resultados sintetizados (provedor fora do ar)
+
+    def _probe(self, servidor):
+        return provider_groups.annotate(servidor, probe_servidor(servidor))
+
+    def submit(self, servidores):
+        skipped, probe = provider_groups.plan(servidores)
+        self.ready.extend(skipped)
+        self.runner.submit(probe)
+
+    def __len__(self):
+        return len(self.ready) + len(self.runner)
+
+    # Espera até `timeout` segundos pelo próximo resultado; retorna [(servidor, resultado)]
+    def collect(self, timeout=None):
+        done, self.ready = self.ready, []
+        done += [(servidor, resultado) for _, servidor, resultado
+                 in self.runner.collect(0 if done else timeout)]
+        return done
+
+    def shutdown(self):
+        self.runner.shutdown(wait=False)
+
+# Alerta único por provedor: o canário também passa pelo quórum (vote), uma vez por
+# verificação nova do canário. Retorna os rótulos dos provedores declarados fora do ar
+def check_providers(traces, dispatcher, state):
+    providers = {}
+    for trace in traces:
+        if trace and trace.get("provider"):
+            providers.setdefault(trace["provider"]["label"], trace["provider"])
+    down = set()
+    for label, provider in providers.items():
+        key = f"provedor:{label}"
+        if state.transition(key, "canary", provider["checked"])[0]:
+            declared = vote(state, key, provider["ok"])
+            if declared is not None:
+                changed, last_status = state.transition(key, "status", declared)
+                if changed and declared == "offline":
+                    dispatcher.notify(f"🏢 Provedor <b>{label}</b> fora do ar ({provider['streams']} streams)\n"
+                                      f"Erro: {provider['error']}")
+                elif changed and last_status == "offline":
+                    dispatcher.notify(f"✅ Provedor <b>{label}</b> voltou ({provider['streams']} streams)")
+        # Só os provedores com alerta enviado: antes do quórum, cada stream alerta sozinho
+        if state.get(key, "status") == "offline":
+            down.add(label)
+    return down
+
+# Atualiza estado e alertas com os resultados de probe_servidor (locais ou enviados
+# por um worker do cluster); `via` identifica o worker que fez a verificação
+def apply_results(servidores, resultados, dispatcher, state, via=None):
+    results = []
+    samples = []
+    down = check_providers([r[2] for r in resultados if r], dispatcher, state)
+    for servidor, resultado in zip(servidores, resultados):
+        probe, latency, trace = resultado or (("❓ Status Desconhecido", None, None, {}), None, end_trace())
+        provider = (trace.get("provider") or {}).get("label")
+        status, response_time = check_single_url(servidor["url"], servidor["nome"], dispatcher, state, probe, via,
+                                                 provider if provider in down else None)
+        record_probe(servidor["nome"], status, trace)
+        details = status if "Offline" in status else describe(probe[3])
+        if "Offline" in status and state.get(servidor["nome"], "status") != "offline":
+            details += " | falha ainda sem quórum de alerta"
+        results.append({
+            "Nome": servidor["nome"],
+            "URL": mask_url(servidor["url"]),
+            "Status": status,
+            "Tempo de Resposta": f"{response_time:.2f}s" if response_time else "N/A",
+            "Latência (Ping)": f"{latency['avg']:.1f} ms (±{latency['jitter']:.1f})" if latency else "N/A",
+            "Última Verificação": datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S"),
+            "Detalhes": f"{details} | via {via}" if via else details
+        })
+        online = "Online" in status
+        # Classe do erro (metrics.note_error) e mensagem, para a linha do tempo de incidentes
+        error_class = None if online else (trace["errors"][-1] if trace["errors"] else "desconhecido")
+        samples.append((servidor["nome"], online, response_time, latency["avg"] if latency else None,
+                        probe[3].get("ttfb") if online else None, error_class,
+                        None if online else (probe[2] or status)[:300]))
+    state.set_many((row["Nome"], "row", row) for row in results)
+    return results, samples
+
+# --- Histórico ---
+# Acrescenta a verificação atual ao banco e, uma vez por hora, aplica a retenção
+def record_history(store, samples, now, state):
+    with timed(HISTORY_WRITE_SECONDS, op="append"):
+        store.append(now, samples)
+    last_compaction = state.get(GLOBAL, "last_compaction")
+    if last_compaction is None or now.timestamp() - last_compaction >= 3600:
+        with timed(HISTORY_WRITE_SECONDS, op="compact"):
+            store.compact(now=now)
+        state.set(GLOBAL, "last_compaction", now.timestamp())
+
+# --- Relatórios ---
+# Gerados em segundo plano (reports.ReportRunner), lendo o histórico em blocos
+# Relatório diário às 23:59, semanal às segundas 8h e mensal no dia 1 às 8h
+# A marca de envio fica no estado compartilhado: cada relatório sai uma única vez
+def run_scheduled_reports(dispatcher, store, state, now):
+    if now.hour == 23 and now.minute == 59 and state.transition(GLOBAL, "report_diario", str(now.date()))[0]:
+        report_runner.submit(dispatcher, store.path, 'diario')
+    if now.weekday() == 0 and now.hour == 8 and state.transition(GLOBAL, "report_semanal", str(now.date()))[0]:
+        report_runner.submit(dispatcher, store.path, 'semanal')
+    if now.day == 1 and now.hour == 8 and state.transition(GLOBAL, "report_mensal", now.strftime('%Y-%m'))[0]:
+        report_runner.submit(dispatcher, store.path, 'mensal')
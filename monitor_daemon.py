@@ -0,0 +1,210 @@
+# Monitor em segundo plano: único dono das verificações, alertas e histórico
+# Uso: python -m monitor_daemon [--intervalo 60] [--uma-vez]
+#      python -m monitor_daemon --agregador | --worker http://agregador:8700 (cluster.py)
+# Com METRICS_PORT definido, expõe métricas OpenMetrics em http://127.0.0.1:<porta>/metrics.
+# Cada servidor é verificado no seu próprio ritmo (scheduler.ProbeScheduler).
+# O painel Streamlit (app_new.py) apenas lê o estado e o histórico gravados por este processo.
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from config import TZ, REFRESH_INTERVAL
+from notifier import init_telegram_bot, dispatcher
+from monitor_core import (load_servers, check_urls, apply_results, record_history, run_scheduled_reports,
+                          ContinuousProbes)
+from history_store import HistoryStore
+from state_store import StateStore
+from server_registry import get_registry
+from probe_engine import session_pool
+from scheduler import ProbeScheduler
+from providers import provider_groups
+from cluster import Aggregator, Worker, start_aggregator_server, CLUSTER_PORT
+from metrics import start_metrics_server, timed, CYCLE_SECONDS, SCHEDULER_QUEUE, HTTP_POOL
+
+logger = logging.getLogger(__name__)
+
+# Uma rodada: verifica `servidores` (por padrão, todos) e espera todos, grava o
+# resultado e o histórico (--uma-vez)
+# `state` é o StateStore compartilhado com o painel
+# `all_servers` define a lista e a ordem da tabela publicada para o painel
+def run_cycle(state, store, servidores=None, all_servers=None, scheduler=None):
+    all_servers = all_servers if all_servers is not None else load_servers()
+    servidores = servidores if servidores is not None else all_servers
+    store.close_removed([s["nome"] for s in all_servers])
+    previous = state.section("status")
+    with timed(CYCLE_SECONDS):
+        rows, samples = check_urls(servidores, dispatcher, state)
+    return record_cycle(state, store, rows, samples, previous, all_servers, scheduler)
+
+# Registra verificações concluídas: reagenda no `scheduler`, grava o histórico e publica
+# `previous` = estados declarados antes de aplicar os resultados (mudança de estado)
+def record_cycle(state, store, rows, samples, previous, all_servers, scheduler=None):
+    now = datetime.now(TZ)
+
+    queue = None
+    if scheduler is not None:
+        for nome, online, *_ in samples:
+            changed = previous.get(nome) != ("online" if online else "offline")
+            scheduler.record(nome, online, changed, time.time())
+        queue = scheduler.stats(time.time())
+
+    # O histórico é gravado antes de publicar: uma versão publicada já tem suas amostras
+    record_history(store, samples, now, state)
+    publish(state, all_servers, now, queue)
+    run_scheduled_reports(dispatcher, store, state, now)
+    pool = session_pool.snapshot()
+    for stat, value in pool.items():
+        HTTP_POOL.set(value, stat=stat)
+    for name, value in (queue or {}).items():
+        SCHEDULER_QUEUE.set(value, state=name)
+    logger.info("Verificação concluída: %d servidores | fila: %s | pool: %s", len(rows), queue, pool)
+    return rows
+
+# Publica a tabela completa para o painel (também serve de sinal de vida do monitor)
+# Retorna o instante (monotônico) da publicação
+def publish(state, all_servers, now, queue=None):
+    state.publish([s["nome"] for s in all_servers], now, queue)
+    return time.monotonic()
+
+# Abre o banco do histórico, migrando o antigo JSON na primeira execução
+def open_store():
+    store = HistoryStore()
+    migrated = store.migrate_json()
+    if migrated:
+        logger.info("Histórico JSON migrado para o banco: %d amostras", migrated)
+    return store
+
+# Laço principal: verifica os servidores conforme vencem na fila do agendador
+def run_forever(interval=REFRESH_INTERVAL, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    start_metrics_server()
+    dispatcher.start(init_telegram_bot())
+    if dispatcher.telegram_enabled:
+        dispatcher.notify("✅ Monitor IPTV iniciado e conectado ao Telegram!")
+    state = StateStore()
+    store = open_store()
+    scheduler = ProbeScheduler(interval)
+    registry = get_registry()
+    probes = ContinuousProbes()
+    published_at = 0
+    synced_version = None
+    try:
+        while not stop_event.is_set():
+            due, done = [], []
+            try:
+                # O cadastro é relido só quando muda; o agendador aplica a diferença
+                version = registry.version()
+                if version != synced_version:
+                    all_servers = registry.servers()
+                    added, removed, changed = scheduler.sync(all_servers, time.time())
+                    provider_groups.update(all_servers)
+                    closed = store.close_removed([s["nome"] for s in all_servers])
+                    if closed:
+                        logger.info("Quedas encerradas de servidores fora do cadastro: %d", closed)
+                    if synced_version is not None:
+                        logger.info("Cadastro recarregado: %d incluídos, %d removidos, %d alterados",
+                                    added, removed, changed)
+                    synced_version = version
+                # Vencidos entram no motor na hora, mesmo com outras verificações em andamento
+                due = scheduler.pop_due(time.time())
+                probes.submit(due)
+                due = []
+                wait = scheduler.next_due_in(time.time())
+                wait = min(wait if wait is not None else 1.0, 1.0)
+                done = probes.collect(wait) if len(probes) else []
+                if done:
+                    servidores = [servidor for servidor, _ in done]
+                    previous = state.section("status")
+                    rows, samples = apply_results(servidores, [resultado for _, resultado in done],
+                                                  dispatcher, state)
+                    record_cycle(state, store, rows, samples, previous, all_servers, scheduler)
+                    published_at = time.monotonic()
+                else:
+                    now = datetime.now(TZ)
+                    if time.monotonic() - published_at >= interval:
+                        published_at = publish(state, all_servers, now, scheduler.stats(time.time()))
+                    run_scheduled_reports(dispatcher, store, state, now)
+                    if not len(probes):
+                        stop_event.wait(wait)
+            except Exception:
+                logger.exception("Erro ao registrar verificações")
+                # Servidores retirados da fila ou com resultado perdido voltam a ser agendados
+                for servidor in due + [servidor for servidor, _ in done]:
+                    scheduler.record(servidor["nome"], False, True, time.time())
+                stop_event.wait(1.0)
+    finally:
+        probes.shutdown()
+        # Esboços da hora corrente ainda em memória
+        store.close()
+
+# Modo agregador: não verifica nada; recebe os resultados dos workers (cluster.py)
+def run_aggregator(interval=REFRESH_INTERVAL, port=CLUSTER_PORT, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    start_metrics_server()
+    dispatcher.start(init_telegram_bot())
+    if dispatcher.telegram_enabled:
+        dispatcher.notify("✅ Monitor IPTV (agregador) iniciado e conectado ao Telegram!")
+    state = StateStore()
+    store = open_store()
+    aggregator = Aggregator(state, store, dispatcher)
+    server = start_aggregator_server(aggregator, port)
+    try:
+        while not stop_event.is_set():
+            try:
+                aggregator.expire()
+                now = datetime.now(TZ)
+                if time.monotonic() - aggregator.published_at >= interval:
+                    aggregator.publish(now)
+                run_scheduled_reports(dispatcher, store, state, now)
+            except Exception:
+                logger.exception("Erro no agregador")
+            stop_event.wait(1.0)
+    finally:
+        server.shutdown()
+        store.close()
+
+# Inicia o monitor numa thread do processo atual (modo embutido do painel)
+def start_in_background(interval=REFRESH_INTERVAL):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=run_forever, args=(interval, stop_event),
+                              name="monitor-iptv", daemon=True)
+    thread.start()
+    return stop_event
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor IPTV em segundo plano")
+    parser.add_argument("--intervalo", type=int, default=REFRESH_INTERVAL,
+                        help="segundos entre verificações (padrão: %(default)s)")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="executa uma única verificação e sai")
+    parser.add_argument("--agregador", action="store_true",
+                        help="recebe os resultados dos workers do cluster em vez de verificar")
+    parser.add_argument("--porta", type=int, default=CLUSTER_PORT,
+                        help="porta do agregador (padrão: %(default)s)")
+    parser.add_argument("--worker", metavar="URL",
+                        help="verifica a parte da lista atribuída pelo agregador em URL")
+    parser.add_argument("--id", help="identificador do worker (padrão: host-pid)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.uma_vez:
+        dispatcher.start(init_telegram_bot())
+        store = open_store()
+        run_cycle(StateStore(), store)
+        store.close()
+        dispatcher.flush()
+        return
+    try:
+        if args.worker:
+            Worker(args.worker, args.id, args.intervalo).run()
+        elif args.agregador:
+            run_aggregator(args.intervalo, args.porta)
+        else:
+            run_forever(args.intervalo)
+    except KeyboardInterrupt:
+        logger.info("Monitor encerrado")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Notificações por Telegram e e-mail
+# As verificações apenas enfileiram mensagens (NotificationDispatcher.notify); uma
+# thread agrupa os alertas de uma janela curta num único resumo por canal, respeita
+# o limite de envio do Telegram e usa uma só conexão SMTP por lote.
+import os
+import re
+import time
+import queue
+import logging
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import telebot
+
+from config import TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, EMAIL_USER, EMAIL_PASS, EMAIL_TO
+from metrics import timed, NOTIFICATION_SECONDS, NOTIFICATIONS
+
+logger = logging.getLogger(__name__)
+
+ALERT_SUBJECT = "Alerta Monitor IPTV"
+# Segundos para juntar alertas num mesmo resumo
+NOTIFY_WINDOW = float(os.environ.get("NOTIFY_WINDOW", "5"))
+# Limite do Telegram para grupos: ~20 mensagens por minuto
+TELEGRAM_RATE = float(os.environ.get("TELEGRAM_RATE", str(20 / 60)))
+TELEGRAM_BURST = int(os.environ.get("TELEGRAM_BURST", "3"))
+TELEGRAM_MAX_LENGTH = 4000
+
+# Inicialização do bot com retry
+def init_telegram_bot():
+    for attempt in range(3):
+        try:
+            bot = telebot.TeleBot(TELEGRAM_TOKEN)
+            bot.get_me()
+            return bot
+        except Exception:
+            if attempt == 2:
+                logger.warning("Não foi possível conectar ao Telegram. O monitoramento continuará, mas sem notificações.")
+                return None
+            time.sleep(2)
+
+# Função para enviar mensagem no Telegram com retry; retorna se foi enviada
+def send_telegram_message(message, bot):
+    if bot is None:
+        return False
+    for attempt in range(3):
+        try:
+            bot.send_message(TELEGRAM_CHAT_ID, message, parse_mode='HTML')
+            return True
+        except Exception:
+            if attempt == 2:
+                logger.error("Erro ao enviar mensagem para o Telegram (tentativa %d/3)", attempt + 1)
+            else:
+                time.sleep(2)
+    return False
+
+def email_enabled():
+    return bool(EMAIL_USER and EMAIL_PASS and EMAIL_TO)
+
+def _email_message(subject, body):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_USER
+    msg['To'] = ", ".join(EMAIL_TO)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+# Envia vários e-mails [(assunto, corpo)] numa única conexão SMTP; retorna se foram enviados
+def send_email_batch(messages):
+    if not (email_enabled() and messages):
+        return False
+    try:
+        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
+            server.login(EMAIL_USER, EMAIL_PASS)
+            for subject, body in messages:
+                server.sendmail(EMAIL_USER, EMAIL_TO, _email_message(subject, body).as_string())
+        return True
+    except Exception as e:
+        logger.warning("Erro ao enviar e-mail: %s", e)
+        return False
+
+class TokenBucket:
+    """Limita a taxa de envio: `rate` fichas por segundo, acumulando até `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+# Pedaços de uma linha maior que o limite, sem as tags HTML (cortada no meio, uma tag
+# invalidaria a mensagem) e sem cortar entidades como &amp;
+def _split_line(line, limit):
+    line = re.sub(r"<[^>]*>", "", line)
+    pieces = []
+    while len(line) > limit:
+        cut = limit
+        amp = line.rfind("&", max(0, limit - 10), limit)
+        if amp > 0 and ";" not in line[amp:limit]:
+            cut = amp
+        pieces.append(line[:cut])
+        line = line[cut:]
+    return pieces + [line]
+
+# Divide um resumo longo em mensagens dentro do limite do Telegram, sem quebrar alertas
+# Um alerta (bloco) maior que o limite é dividido nas quebras de linha
+def _split_message(text, limit=TELEGRAM_MAX_LENGTH):
+    units = []
+    for block in text.split("\n\n"):
+        if len(block) <= limit:
+            units.append(("\n\n", block))
+            continue
+        for i, line in enumerate(block.split("\n")):
+            pieces = [line] if len(line) <= limit else _split_line(line, limit)
+            units += [("\n\n" if i == 0 and j == 0 else "\n", piece) for j, piece in enumerate(pieces)]
+    parts, current = [], ""
+    for separator, unit in units:
+        if current and len(current) + len(separator) + len(unit) > limit:
+            parts.append(current)
+            current = ""
+        current = f"{current}{separator}{unit}" if current else unit
+    if current:
+        parts.append(current)
+    return parts
+
+class NotificationDispatcher:
+    """Fila de notificações atendida por uma thread; notify() nunca bloqueia."""
+
+    def __init__(self, window=NOTIFY_WINDOW, telegram_rate=TELEGRAM_RATE, telegram_burst=TELEGRAM_BURST):
+        self.window = window
+        self.bucket = TokenBucket(telegram_rate, telegram_burst)
+        self.queue = queue.Queue()
+        self.bot = None
+        self.thread = None
+
+    @property
+    def telegram_enabled(self):
+        return self.bot is not None
+
+    @property
+    def enabled(self):
+        return self.bot is not None or email_enabled()
+
+    def start(self, bot):
+        self.bot = bot
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="notificacoes", daemon=True)
+            self.thread.start()
+
+    def notify(self, message, subject=ALERT_SUBJECT):
+        self.queue.put((subject, message))
+
+    # Aguarda o envio de tudo que já foi enfileirado
+    def flush(self):
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._deliver(batch)
+            except Exception:
+                logger.exception("Erro ao enviar notificações")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    # Um resumo por assunto: alertas da janela juntos, cada relatório separado
+    def _deliver(self, batch):
+        grouped = {}
+        for subject, message in batch:
+            grouped.setdefault(subject, []).append(message)
+        digests = []
+        for subject, messages in grouped.items():
+            if len(messages) > 1:
+                body = f"<b>🔔 {len(messages)} alertas</b>\n\n" + "\n\n".join(messages)
+            else:
+                body = messages[0]
+            digests.append((subject, body))
+
+        if self.bot is not None:
+            for _, body in digests:
+                for part in _split_message(body):
+                    self.bucket.acquire()
+                    with timed(NOTIFICATION_SECONDS, channel="telegram"):
+                        sent = send_telegram_message(part, self.bot)
+                    NOTIFICATIONS.inc(channel="telegram", result="ok" if sent else "error")
+        if email_enabled():
+            with timed(NOTIFICATION_SECONDS, channel="email"):
+                sent = send_email_batch(digests)
+            NOTIFICATIONS.inc(len(digests), channel="email", result="ok" if sent else "error")
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,199 @@
+# Motor de verificação concorrente dos servidores IPTV
+# As funções deste módulo não dependem do Streamlit, para poderem rodar em threads
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+
+from config import ALERT_QUORUM
+from http_pool import SessionPool, release
+from metrics import add_phase, phase_total, note_retry, note_error
+from stream_check import inspect_stream, is_slow, StreamError
+
+logger = logging.getLogger(__name__)
+
+# Limites de concorrência (configuráveis por variáveis de ambiente)
+MAX_IN_FLIGHT = int(os.environ.get("PROBE_MAX_IN_FLIGHT", "32"))
+MAX_PER_HOST = int(os.environ.get("PROBE_MAX_PER_HOST", "4"))
+# Timeout (s) e tentativas de cada requisição
+# Com quórum de alertas, a confirmação vem das próximas verificações (o agendador
+# antecipa a próxima após uma falha), então uma única tentativa basta por padrão
+PROBE_TIMEOUT = float(os.environ.get("PROBE_TIMEOUT", "30"))
+PROBE_RETRIES = int(os.environ.get("PROBE_RETRIES", "3" if ALERT_QUORUM <= 1 else "1"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "*/*"
+}
+
+# Sessões com keep-alive compartilhadas por todas as verificações
+session_pool = SessionPool(HEADERS, max_per_host=MAX_PER_HOST)
+
+# Fases registradas pelas conexões (http_pool) antes dos cabeçalhos da resposta
+CONNECTION_PHASES = ("dns", "connect", "tls")
+
+# Classe da falha de requisição para as métricas
+def classify_error(error):
+    message = str(error).lower()
+    if isinstance(error, requests.Timeout) or "timeout" in message or "timed out" in message:
+        return "timeout"
+    if "dns" in message or "name or service" in message or "resolve" in message:
+        return "dns"
+    if isinstance(error, requests.HTTPError):
+        return "http"
+    return "connection"
+
+# Função para extrair o host (sem porta nem credenciais) de uma URL
+def extract_host(url):
+    try:
+        host = urlparse(url).hostname
+    except ValueError:
+        host = None
+    return host or url.split("//")[-1].split("/")[0]
+
+# Função para requisitar uma URL com retentativas, sem efeitos colaterais
+# Com `deep`, interpreta a playlist e mede a vazão do primeiro segmento (stream_check)
+def fetch_status(url, timeout=PROBE_TIMEOUT, retries=PROBE_RETRIES, deep=False):
+    """Retorna (status, tempo de resposta em s, mensagem de erro, detalhes)."""
+    start_time = time.time()
+    for attempt in range(retries):
+        if attempt:
+            note_retry()
+        try:
+            connecting = sum(phase_total(phase) for phase in CONNECTION_PHASES)
+            response = session_pool.get(url).get(url, timeout=timeout, stream=True)
+            response_time = time.time() - start_time
+            # Espera pelo servidor: do envio até os cabeçalhos, sem DNS/TCP/TLS
+            connecting = sum(phase_total(phase) for phase in CONNECTION_PHASES) - connecting
+            add_phase("ttfb", max(0.0, response.elapsed.total_seconds() - connecting))
+            body_started = time.perf_counter()
+            try:
+                if deep:
+                    details = inspect_stream(response, session_pool, response.elapsed.total_seconds(), timeout)
+                    if is_slow(details):
+                        return f"🟢 Online (Lento: {details['throughput_mbps']:.1f} Mbit/s)", response_time, None, details
+                    return "🟢 Online", response_time, None, details
+                next(response.iter_content(chunk_size=1024))
+                return "🟢 Online", response_time, None, {"ttfb": response.elapsed.total_seconds()}
+            except StreamError as e:
+                note_error("http" if str(e).startswith("HTTP") else "stream")
+                return f"🔴 Offline ({e})", None, str(e), {}
+            except requests.RequestException:
+                raise
+            except Exception:
+                note_error("content")
+                return "🔴 Offline (Sem conteúdo)", None, "Sem conteúdo", {}
+            finally:
+                release(response)
+                add_phase("body", time.perf_counter() - body_started)
+        except requests.RequestException as e:
+            note_error(classify_error(e))
+            if attempt == retries - 1:
+                error_msg = str(e)
+                if "timeout" in error_msg.lower():
+                    return "🔴 Offline (Timeout)", None, error_msg, {}
+                elif "dns" in error_msg.lower():
+                    return "🔴 Offline (DNS)", None, error_msg, {}
+                else:
+                    return f"🔴 Offline ({error_msg})", None, error_msg, {}
+            time.sleep(1)
+    return "❓ Status Desconhecido", None, None, {}
+
+# Executor de verificações de longa duração
+# Verificações podem ser enviadas a qualquer momento (submit) e os resultados são
+# recolhidos à medida que terminam (collect): um servidor sem resposta ocupa só a sua
+# vaga até o timeout, sem segurar os demais. Respeita um limite global de requisições
+# simultâneas e um limite por host, distribuindo as vagas entre os hosts em rodízio.
+# Deve ser usado por uma única thread.
+class ProbeRunner:
+    """Fila por host e ThreadPoolExecutor para `probe(servidor)`."""
+
+    def __init__(self, probe, max_in_flight=None, per_host=None):
+        self.probe = probe
+        self.max_in_flight = max(1, max_in_flight or MAX_IN_FLIGHT)
+        self.per_host = max(1, per_host or MAX_PER_HOST)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.pendentes = {}     # host -> deque[(id, servidor)]
+        self.ativos = {}        # host -> verificações em andamento
+        self.em_execucao = {}   # future -> (id, servidor, host)
+        self.next_id = 0
+
+    # Enfileira `servidores`; retorna o identificador de cada um (na mesma ordem)
+    def submit(self, servidores):
+        ids = []
+        for servidor in servidores:
+            host = extract_host(servidor["url"])
+            self.pendentes.setdefault(host, deque()).append((self.next_id, servidor))
+            self.ativos.setdefault(host, 0)
+            ids.append(self.next_id)
+            self.next_id += 1
+        self._preencher()
+        return ids
+
+    def _preencher(self):
+        adicionou = True
+        while adicionou and len(self.em_execucao) < self.max_in_flight:
+            adicionou = False
+            for host in list(self.pendentes):
+                if len(self.em_execucao) >= self.max_in_flight:
+                    break
+                fila = self.pendentes[host]
+                if self.ativos[host] >= self.per_host:
+                    continue
+                probe_id, servidor = fila.popleft()
+                self.ativos[host] += 1
+                self.em_execucao[self.executor.submit(self.probe, servidor)] = (probe_id, servidor, host)
+                adicionou = True
+                if not fila:
+                    del self.pendentes[host]
+
+    # Verificações enfileiradas ou em andamento
+    def __len__(self):
+        return len(self.em_execucao) + sum(len(fila) for fila in self.pendentes.values())
+
+    # Espera até `timeout` segundos (None = sem limite) pela próxima verificação concluída
+    # Retorna [(id, servidor, resultado)] de todas as já concluídas (resultado None
+    # quando a verificação levantou exceção); lista vazia se nada terminou
+    def collect(self, timeout=None):
+        if not self.em_execucao:
+            return []
+        done, _ = wait(self.em_execucao, timeout=timeout, return_when=FIRST_COMPLETED)
+        concluidos = []
+        for future in done:
+            probe_id, servidor, host = self.em_execucao.pop(future)
+            self.ativos[host] -= 1
+            if not self.ativos[host] and host not in self.pendentes:
+                del self.ativos[host]
+            try:
+                concluidos.append((probe_id, servidor, future.result()))
+            except Exception:
+                logger.exception("Erro ao verificar %s", servidor.get("nome"))
+                concluidos.append((probe_id, servidor, None))
+        self._preencher()
+        return concluidos
+
+    # Encerra o executor; verificações ainda na fila são descartadas
+    def shutdown(self, wait=True):
+        self.pendentes.clear()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+# Executa `probe(servidor)` para todos os servidores em paralelo (ProbeRunner) e
+# espera todos. Retorna os resultados na mesma ordem de `servidores` (None quando a
+# verificação levantou exceção).
+def run_probes(servidores, probe, max_in_flight=None, per_host=None):
+    results = [None] * len(servidores)
+    if not servidores:
+        return results
+    runner = ProbeRunner(probe, min(max(1, max_in_flight or MAX_IN_FLIGHT), len(servidores)), per_host)
+    try:
+        posicoes = {probe_id: i for i, probe_id in enumerate(runner.submit(servidores))}
+        while len(runner):
+            for probe_id, _, result in runner.collect():
+                results[posicoes[probe_id]] = result
+    finally:
+        runner.shutdown()
+    return results
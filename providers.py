@@ -0,0 +1,236 @@
+# Agrupamento por provedor e sonda canário
+# Servidores cujo host resolve para o mesmo IP (e porta) formam um provedor. Antes das
+# verificações de um provedor com PROVIDER_MIN_STREAMS ou mais streams, uma conexão
+# TCP ao provedor (canário) é feita uma vez a cada CANARY_INTERVAL segundos. Com o
+# canário fora do ar, as verificações individuais do provedor não são feitas: cada
+# stream recebe um resultado offline marcado com o provedor, e os alertas individuais
+# dão lugar a um único alerta "provedor fora do ar (N streams)" (monitor_core).
+import os
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from probe_engine import run_probes, MAX_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# Tamanho mínimo do grupo para usar o canário (0 desativa o agrupamento)
+PROVIDER_MIN_STREAMS = int(os.environ.get("PROVIDER_MIN_STREAMS", "3"))
+CANARY_INTERVAL = float(os.environ.get("CANARY_INTERVAL", "5"))
+CANARY_TIMEOUT = float(os.environ.get("CANARY_TIMEOUT", "5"))
+# Validade do IP resolvido de cada host (s); os grupos são refeitos quando ela vence
+PROVIDER_DNS_TTL = float(os.environ.get("PROVIDER_DNS_TTL", "3600"))
+# Tempo máximo (s) para resolver os hosts; os que não respondem ficam agrupados pelo
+# nome e são tentados de novo em PROVIDER_DNS_RETRY segundos
+PROVIDER_DNS_TIMEOUT = float(os.environ.get("PROVIDER_DNS_TIMEOUT", "5"))
+PROVIDER_DNS_RETRY = 60
+
+def _lookup(host):
+    try:
+        return socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)[0][4][0]
+    except (OSError, UnicodeError):
+        return None
+
+def _endpoint(url):
+    try:
+        parsed = urlparse(url)
+        return parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return None, None
+
+# Conexão TCP ao provedor; retorna (ok, classe do erro, mensagem)
+def tcp_canary(host, port, timeout=CANARY_TIMEOUT):
+    try:
+        socket.create_connection((host, port), timeout=timeout).close()
+        return True, None, None
+    except socket.gaierror as e:
+        return False, "dns", str(e)
+    except socket.timeout as e:
+        return False, "timeout", str(e) or "timed out"
+    except OSError as e:
+        return False, "connection", str(e)
+
+class ProviderGroups:
+    """Provedores da lista atual e o último resultado do canário de cada um."""
+
+    def __init__(self, min_streams=PROVIDER_MIN_STREAMS, canary_interval=CANARY_INTERVAL, canary=tcp_canary):
+        self.min_streams = min_streams
+        self.canary_interval = canary_interval
+        self.canary = canary
+        self.lock = threading.Lock()
+        self.updating = threading.Lock()   # um update por vez (worker: heartbeat e rodadas)
+        self.ips = {}           # host -> (validade, IP)
+        self.servidores = None  # lista do último update (para refazer os grupos)
+        self.expires = None     # quando algum IP resolvido vence
+        self.groups = {}        # chave -> {"label", "names", "target"}
+        self.of = {}            # nome -> chave do provedor (só grupos com o tamanho mínimo)
+        self.canaries = {}      # chave -> {"checked", "ok", "class", "error"}
+        self.checking = False   # canários sendo atualizados em segundo plano (plan)
+
+    # Resolve em paralelo os hosts sem IP válido, com limite de PROVIDER_DNS_TIMEOUT
+    # no total (threads presas num DNS lento são abandonadas)
+    def _resolve(self, hosts, now):
+        stale = [h for h in hosts if h not in self.ips or self.ips[h][0] <= now]
+        if not stale:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(MAX_IN_FLIGHT, len(stale)))
+        futures = {executor.submit(_lookup, host): host for host in stale}
+        done, _ = wait(futures, timeout=PROVIDER_DNS_TIMEOUT)
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future, host in futures.items():
+            ip = future.result() if future in done else None
+            # Falhas são tentadas de novo antes do TTL
+            self.ips[host] = (now + (PROVIDER_DNS_TTL if ip else min(PROVIDER_DNS_RETRY, PROVIDER_DNS_TTL)), ip)
+
+    # Recalcula os grupos a partir da lista completa de servidores
+    def update(self, servidores):
+        if self.min_streams <= 0:
+            return
+        with self.updating:
+            self._update(servidores)
+
+    def _update(self, servidores):
+        now = time.monotonic()
+        endpoints = [(servidor, *_endpoint(servidor["url"])) for servidor in servidores]
+        hosts = {host for _, host, _ in endpoints if host}
+        self._resolve(hosts, now)
+        self.ips = {host: entry for host, entry in self.ips.items() if host in hosts}
+        groups = {}
+        for servidor, host, port in endpoints:
+            if not host:
+                continue
+            # A porta faz parte da chave: o canário só diz algo sobre a porta testada
+            key = f"{self.ips[host][1] or host}:{port}"
+            group = groups.setdefault(key, {"hosts": [], "names": [], "target": (host, port)})
+            if host not in group["hosts"]:
+                group["hosts"].append(host)
+            group["names"].append(servidor["nome"])
+        with self.lock:
+            self.groups = {}
+            self.of = {}
+            for key, group in groups.items():
+                if len(group["names"]) < self.min_streams:
+                    continue
+                hosts = group["hosts"]
+                port = group["target"][1]
+                suffix = f":{port}" if port not in (80, 443) else ""
+                if len(hosts) == 1:
+                    group["label"] = f"{hosts[0]}{suffix}"
+                else:
+                    group["label"] = f"{key} ({', '.join(hosts[:3])}{', ...' if len(hosts) > 3 else ''})"
+                self.groups[key] = group
+                for nome in group["names"]:
+                    self.of[nome] = key
+            self.canaries = {k: v for k, v in self.canaries.items() if k in self.groups}
+            self.servidores = servidores
+            self.expires = min((entry[0] for entry in self.ips.values()), default=None)
+
+    # Canários vencidos dos provedores em `keys`, em paralelo
+    def _check(self, keys):
+        now = time.time()
+        with self.lock:
+            stale = [k for k in keys if k in self.groups and
+                     now - self.canaries.get(k, {}).get("checked", 0) >= self.canary_interval]
+            targets = [{"url": f"tcp://{self.groups[k]['target'][0]}", "key": k,
+                        "target": self.groups[k]["target"]} for k in stale]
+        results = run_probes(targets, lambda t: self.canary(*t["target"]))
+        with self.lock:
+            for target, result in zip(targets, results):
+                ok, error_class, error = result or (False, "connection", "falha no canário")
+                previous = self.canaries.get(target["key"])
+                group = self.groups.get(target["key"])
+                if group is None:
+                    continue
+                if previous is not None and previous["ok"] != ok:
+                    logger.info("Canário do provedor %s: %s", group["label"],
+                                "online" if ok else f"fora do ar ({error})")
+                self.canaries[target["key"]] = {"checked": time.time(), "ok": ok,
+                                                "class": error_class, "error": error}
+
+    def _check_in_background(self, keys):
+        try:
+            self._check(keys)
+        except Exception:
+            logger.exception("Erro nos canários dos provedores")
+        finally:
+            with self.lock:
+                self.checking = False
+
+    # Provedores de `servidores` e o último resultado do canário de cada um (chave -> info)
+    def _info(self, servidores, refresh=True):
+        # IPs vencidos: refaz os grupos com a última lista recebida
+        if refresh and self.expires is not None and time.monotonic() >= self.expires:
+            self.update(self.servidores)
+        keys = {self.of.get(s["nome"]) for s in servidores} - {None}
+        with self.lock:
+            info = {}
+            for key in keys:
+                canary = self.canaries.get(key)
+                if canary is not None and key in self.groups:
+                    info[key] = {"label": self.groups[key]["label"], "streams": len(self.groups[key]["names"]),
+                                 "ok": canary["ok"], "checked": canary["checked"],
+                                 "class": canary["class"], "error": canary["error"]}
+        return keys, info
+
+    # Resultado sintetizado para um stream de provedor com o canário fora do ar
+    def _skipped(self, provider):
+        message = f"Provedor {provider['label']} fora do ar: {provider['error']}"
+        return (("🔴 Offline (Provedor fora do ar)", None, message, {}), None,
+                {"phases": {}, "retries": 0, "errors": [provider["class"]],
+                 "provider": dict(provider, skipped=True)})
+
+    # Separa `servidores` sem bloquear: usa o último resultado de cada canário e atualiza
+    # os vencidos numa thread à parte (sem resultado ainda, o stream é verificado)
+    # Retorna ([(servidor, resultado sintetizado)], servidores a verificar)
+    def plan(self, servidores):
+        keys, info = self._info(servidores)
+        if keys:
+            with self.lock:
+                start = not self.checking
+                self.checking = True
+            if start:
+                threading.Thread(target=self._check_in_background, args=(keys,),
+                                 name="canarios", daemon=True).start()
+        skipped, probe = [], []
+        for servidor in servidores:
+            provider = info.get(self.of.get(servidor["nome"]))
+            if provider is not None and not provider["ok"]:
+                skipped.append((servidor, self._skipped(provider)))
+            else:
+                probe.append(servidor)
+        return skipped, probe
+
+    # Marca no trace o provedor do servidor verificado: trace["provider"] =
+    # {label, streams, ok, checked, skipped, error}; pode rodar nas threads de verificação
+    def annotate(self, servidor, resultado):
+        key = self.of.get(servidor["nome"])
+        if resultado is not None and key is not None:
+            _, info = self._info([servidor], refresh=False)
+            if key in info:
+                resultado[2]["provider"] = dict(info[key], skipped=False)
+        return resultado
+
+    # Verifica `servidores` com `probe`, consultando antes (e esperando) o canário de
+    # cada provedor. Retorna os resultados na ordem de `servidores`, como run_probes
+    def run(self, servidores, probe):
+        keys, _ = self._info(servidores)
+        if keys:
+            self._check(keys)
+        _, info = self._info(servidores)
+        results = [None] * len(servidores)
+        probed = []
+        for i, servidor in enumerate(servidores):
+            provider = info.get(self.of.get(servidor["nome"]))
+            if provider is not None and not provider["ok"]:
+                results[i] = self._skipped(provider)
+            else:
+                probed.append(i)
+        for i, result in zip(probed, run_probes([servidores[i] for i in probed], probe)):
+            results[i] = self.annotate(servidores[i], result)
+        return results
+
+# Grupos do processo (monitor em segundo plano ou worker do cluster)
+provider_groups = ProviderGroups()
@@ -0,0 +1,112 @@
+# Relatórios diário, semanal e mensal
+# Os indicadores saem dos intervalos de queda (incidents.py): SLA, MTTR, MTBF e maior
+# queda por servidor, com custo proporcional ao número de quedas e não de amostras,
+# e exatos qualquer que seja a frequência das verificações. Os envios agendados
+# rodam numa thread própria, com conexão própria ao banco, sem atrasar as
+# verificações nem o painel.
+import queue
+import logging
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from config import TZ
+from history_store import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+# Resumo por servidor do período [start, end): {nome: {sla, incidents, mttr, mtbf, longest, ...}}
+def build_report(store, start, end=None):
+    return store.incident_report(start, end)
+
+# Duração legível: 45s, 12m, 2h05m, 3d04h
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, _ = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h{minutes:02d}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d{hours:02d}h"
+
+def _format_report(title, report):
+    msg = f'<b>{title}</b>\n'
+    for s, t in report.items():
+        msg += (f"\n<b>{s}</b>: SLA: {t['sla']:.2f}% | Incidentes: {t['incidents']}"
+                f" | MTTR: {format_duration(t['mttr'])} | MTBF: {format_duration(t['mtbf'])}"
+                f" | Maior queda: {format_duration(t['longest'])}")
+        if t['ongoing']:
+            msg += " (em andamento)"
+    return msg
+
+# Função para enviar relatório diário automático no Telegram
+def send_daily_report(dispatcher, store):
+    if not dispatcher.telegram_enabled:
+        return
+    report = build_report(store, datetime.now(TZ) - pd.Timedelta(days=1))
+    if not report:
+        return
+    title = '📊 Relatório Diário IPTV'
+    dispatcher.notify(_format_report(title, report), subject=title)
+
+# --- Relatório semanal/mensal automático ---
+def send_periodic_report(dispatcher, store, period='semanal'):
+    if not dispatcher.enabled:
+        return
+    now = datetime.now(TZ)
+    if period == 'semanal':
+        start = now - pd.Timedelta(days=7)
+        title = '📊 Relatório Semanal IPTV'
+    else:
+        start = now - pd.Timedelta(days=30)
+        title = '📊 Relatório Mensal IPTV'
+    report = build_report(store, start, now)
+    if not report:
+        return
+    dispatcher.notify(_format_report(title, report), subject=title)
+
+class ReportRunner:
+    """Gera os relatórios agendados numa thread, um por vez, com conexão própria ao banco."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # period: 'diario', 'semanal' ou 'mensal'; `path` é o arquivo do histórico
+    def submit(self, dispatcher, path, period):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="relatorios", daemon=True)
+                self.thread.start()
+        self.queue.put((dispatcher, path, period))
+
+    # Aguarda os relatórios já enfileirados
+    def join(self):
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            dispatcher, path, period = self.queue.get()
+            store = None
+            try:
+                store = HistoryStore(path)
+                if period == 'diario':
+                    send_daily_report(dispatcher, store)
+                else:
+                    send_periodic_report(dispatcher, store, period)
+            except Exception:
+                logger.exception("Erro ao gerar o relatório %s", period)
+            finally:
+                if store is not None:
+                    store.close()
+                self.queue.task_done()
+
+report_runner = ReportRunner()
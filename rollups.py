@@ -0,0 +1,152 @@
+# Agregados de uptime mantidos incrementalmente (por minuto, hora e dia)
+# Cada verificação atualiza em O(1) os contadores do servidor nos três níveis;
+# painel e relatórios somam baldes prontos em vez de recalcular a partir das amostras.
+import math
+from datetime import datetime, timedelta
+
+from config import TZ
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    online INTEGER NOT NULL DEFAULT 0,
+    offline INTEGER NOT NULL DEFAULT 0,
+    incidents INTEGER NOT NULL DEFAULT 0,
+    rt_count INTEGER NOT NULL DEFAULT 0,
+    rt_sum REAL NOT NULL DEFAULT 0,
+    rt_sumsq REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, server_id)
+) WITHOUT ROWID;
+"""
+
+GRANULARITIES = ("minute", "hour", "day")
+
+# Dias mantidos em cada granularidade
+RETENTION_DAYS = {"minute": 2, "hour": 90, "day": 800}
+
+UPSERT = """
+INSERT INTO rollups(granularity, bucket, server_id, online, offline, incidents, rt_count, rt_sum, rt_sumsq)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(granularity, bucket, server_id) DO UPDATE SET
+    online = online + excluded.online,
+    offline = offline + excluded.offline,
+    incidents = incidents + excluded.incidents,
+    rt_count = rt_count + excluded.rt_count,
+    rt_sum = rt_sum + excluded.rt_sum,
+    rt_sumsq = rt_sumsq + excluded.rt_sumsq
+"""
+
+# Dias começam à meia-noite no fuso do monitor; minutos e horas seguem a época Unix
+def floor_day(ts):
+    local = datetime.fromtimestamp(ts, TZ)
+    return int(TZ.localize(datetime(local.year, local.month, local.day)).timestamp())
+
+def next_day(ts):
+    local = datetime.fromtimestamp(ts, TZ).date() + timedelta(days=1)
+    return int(TZ.localize(datetime(local.year, local.month, local.day)).timestamp())
+
+def bucket_start(ts, granularity):
+    if granularity == "minute":
+        return ts - ts % 60
+    if granularity == "hour":
+        return ts - ts % 3600
+    return floor_day(ts)
+
+# Decompõe [start, end) em baldes: dias inteiros no meio, horas e minutos nas bordas.
+# Retorna [(granularidade, primeiro_balde, fim)] — o custo não depende do tamanho do período.
+def _segments(start, end, granularity="day"):
+    if start >= end:
+        return []
+    if granularity == "minute":
+        return [("minute", bucket_start(start, "minute"), end)]
+    if granularity == "hour":
+        lo = -(-start // 3600) * 3600
+        hi = end - end % 3600
+        finer = "minute"
+    else:
+        lo = start if floor_day(start) == start else next_day(start)
+        hi = floor_day(end)
+        finer = "hour"
+    if lo >= hi:
+        return _segments(start, end, finer)
+    return _segments(start, lo, finer) + [(granularity, lo, hi)] + _segments(hi, end, finer)
+
+class Rollups:
+    """Contadores por servidor e balde; usa a conexão e a trava do HistoryStore."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.executescript(ROLLUP_SCHEMA)
+        # Último status conhecido de cada servidor, para contar incidentes (online -> offline)
+        self.last_online = dict(self.conn.execute(
+            "SELECT s.server_id, s.online FROM samples s "
+            "JOIN (SELECT server_id, MAX(ts) AS ts FROM samples GROUP BY server_id) m "
+            "ON m.server_id = s.server_id AND m.ts = s.ts"
+        ).fetchall())
+
+    # Deve ser chamado dentro da transação que grava as amostras
+    # rows = [(server_id, online, tempo_resposta), ...]
+    def add(self, ts, rows):
+        params = []
+        for server_id, online, response_time in rows:
+            online = bool(online)
+            incident = int(not online and self.last_online.get(server_id, True))
+            self.last_online[server_id] = online
+            rt = response_time if response_time is not None else 0.0
+            has_rt = int(response_time is not None)
+            for granularity in GRANULARITIES:
+                params.append((granularity, bucket_start(ts, granularity), server_id,
+                               int(online), int(not online), incident, has_rt, rt, rt * rt))
+        self.conn.executemany(UPSERT, params)
+
+    # Reconstrói os agregados a partir das amostras (bancos criados antes dos agregados)
+    def rebuild(self):
+        self.conn.execute("DELETE FROM rollups")
+        self.last_online = {}
+        cursor = self.conn.execute("SELECT ts, server_id, online, response_time FROM samples ORDER BY ts")
+        batch_ts, batch = None, []
+        for ts, server_id, online, response_time in cursor:
+            if ts != batch_ts and batch:
+                self.add(batch_ts, batch)
+                batch = []
+            batch_ts = ts
+            batch.append((server_id, online, response_time))
+        if batch:
+            self.add(batch_ts, batch)
+
+    def compact(self, now_ts):
+        for granularity, days in RETENTION_DAYS.items():
+            self.conn.execute("DELETE FROM rollups WHERE granularity = ? AND bucket < ?",
+                              (granularity, now_ts - days * 86400))
+
+    # Totais por servidor no período [start, end) (epochs)
+    # Retorna {nome: {online, offline, incidents, uptime, avg_rt, std_rt}}
+    def totals(self, start, end):
+        segments = _segments(start, end)
+        if not segments:
+            return {}
+        where = " OR ".join("(r.granularity = ? AND r.bucket >= ? AND r.bucket < ?)" for _ in segments)
+        params = [p for segment in segments for p in segment]
+        rows = self.conn.execute(
+            "SELECT v.name, SUM(r.online), SUM(r.offline), SUM(r.incidents), "
+            "SUM(r.rt_count), SUM(r.rt_sum), SUM(r.rt_sumsq) "
+            f"FROM rollups r JOIN servers v ON v.id = r.server_id WHERE {where} "
+            "GROUP BY v.name ORDER BY v.name", params
+        ).fetchall()
+        return {name: _summary(online, offline, incidents, rt_count, rt_sum, rt_sumsq)
+                for name, online, offline, incidents, rt_count, rt_sum, rt_sumsq in rows}
+
+def _summary(online, offline, incidents, rt_count, rt_sum, rt_sumsq):
+    total = online + offline
+    avg_rt = rt_sum / rt_count if rt_count else None
+    std_rt = math.sqrt(max(0.0, rt_sumsq / rt_count - avg_rt * avg_rt)) if rt_count else None
+    return {
+        "online": online,
+        "offline": offline,
+        "incidents": incidents,
+        "uptime": online / total * 100 if total else 0.0,
+        "avg_rt": avg_rt,
+        "std_rt": std_rt,
+    }
@@ -0,0 +1,114 @@
+# Agendamento adaptativo das verificações por servidor
+# Cada servidor tem seu próximo horário de verificação: após falha ou mudança de
+# estado o intervalo volta ao mínimo; enquanto estável, dobra até o máximo.
+# Um desvio aleatório (jitter) espalha as verificações para não atingir os
+# provedores todos no mesmo instante.
+# Servidores com "intervalo" no cadastro usam esse valor como base.
+import os
+import heapq
+import random
+import threading
+
+from config import REFRESH_INTERVAL
+
+PROBE_MIN_INTERVAL = float(os.environ.get("PROBE_MIN_INTERVAL", str(max(10, REFRESH_INTERVAL / 4))))
+PROBE_MAX_INTERVAL = float(os.environ.get("PROBE_MAX_INTERVAL", str(REFRESH_INTERVAL * 8)))
+PROBE_JITTER = float(os.environ.get("PROBE_JITTER", "0.2"))
+
+class ProbeScheduler:
+    """Fila de prioridade (heap) de servidores pelo próximo horário de verificação."""
+
+    def __init__(self, base_interval=REFRESH_INTERVAL, min_interval=PROBE_MIN_INTERVAL,
+                 max_interval=PROBE_MAX_INTERVAL, jitter=PROBE_JITTER, rng=None):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.heap = []          # (próximo horário, nome)
+        self.servers = {}       # nome -> servidor
+        self.intervals = {}     # nome -> intervalo atual
+        self.due_at = {}        # nome -> próximo horário válido (entradas antigas do heap são ignoradas)
+
+    def _jittered(self, interval):
+        return interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _push(self, nome, when):
+        self.due_at[nome] = when
+        heapq.heappush(self.heap, (when, nome))
+
+    # Intervalo base do servidor: o do cadastro ("intervalo") ou o padrão
+    def _base(self, servidor):
+        return servidor.get("intervalo") or self.base_interval
+
+    # Sincroniza com a lista atual aplicando só a diferença: novos servidores entram
+    # espalhados no primeiro intervalo; removidos saem; URL alterada força nova
+    # verificação imediata; outro intervalo reagenda; os demais ficam como estão
+    # Retorna (incluídos, removidos, alterados)
+    def sync(self, servidores, now):
+        added = removed = changed = 0
+        with self.lock:
+            current = {s["nome"]: s for s in servidores}
+            for nome in list(self.servers):
+                if nome not in current:
+                    del self.servers[nome]
+                    self.intervals.pop(nome, None)
+                    self.due_at.pop(nome, None)
+                    removed += 1
+            for nome, servidor in current.items():
+                previous = self.servers.get(nome)
+                self.servers[nome] = servidor
+                if previous is None:
+                    added += 1
+                    self.intervals[nome] = self._base(servidor)
+                    self._push(nome, now + self.rng.uniform(0, self._base(servidor) * self.jitter))
+                elif previous != servidor:
+                    changed += 1
+                    if previous.get("url") != servidor.get("url"):
+                        self.intervals[nome] = min(self.min_interval, self._base(servidor))
+                        self._push(nome, now)
+                    elif previous.get("intervalo") != servidor.get("intervalo"):
+                        self.intervals[nome] = self._base(servidor)
+                        self._push(nome, now + self._jittered(self._base(servidor)))
+        return added, removed, changed
+
+    # Retira da fila os servidores cujo horário já chegou
+    def pop_due(self, now):
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                when, nome = heapq.heappop(self.heap)
+                if self.due_at.get(nome) != when:
+                    continue
+                del self.due_at[nome]
+                due.append(self.servers[nome])
+        return due
+
+    # Reagenda após a verificação: falha ou mudança de estado -> intervalo mínimo;
+    # estável e online -> o intervalo dobra até o máximo
+    def record(self, nome, online, changed, now):
+        with self.lock:
+            if nome not in self.servers:
+                return
+            base = self._base(self.servers[nome])
+            if changed or not online:
+                interval = min(self.min_interval, base)
+            else:
+                interval = min(self.intervals.get(nome, base) * 2, max(self.max_interval, base))
+            self.intervals[nome] = interval
+            self._push(nome, now + self._jittered(interval))
+
+    # Segundos até a próxima verificação (None com a fila vazia)
+    def next_due_in(self, now):
+        with self.lock:
+            while self.heap and self.due_at.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            return max(0.0, self.heap[0][0] - now) if self.heap else None
+
+    # Tamanho da fila: servidores agendados e quantos já estão atrasados
+    def stats(self, now):
+        with self.lock:
+            overdue = sum(1 for when in self.due_at.values() if when <= now)
+            return {"scheduled": len(self.due_at), "overdue": overdue,
+                    "in_progress": len(self.servers) - len(self.due_at)}
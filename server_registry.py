@@ -0,0 +1,243 @@
+# Cadastro persistente de servidores (SQLite)
+# Cada servidor tem nome, URL, grupo, tags, intervalo e timeout próprios e pode ser
+# desativado sem perder o histórico. Toda alteração incrementa a versão do cadastro:
+# o monitor, o agregador e o painel consultam só a versão (uma leitura por chave) e
+# recarregam a lista quando ela muda, sem reiniciar nada. O agendador aplica a
+# diferença (scheduler.ProbeScheduler.sync): servidores existentes mantêm estado,
+# histórico e conexões.
+# SERVIDOR_URLS (só num cadastro novo) e o antigo servidores_custom.json apenas semeiam o cadastro.
+# Uso: python -m server_registry listar | importar arquivo.json [--grupo G]
+#      | remover NOME... | ativar NOME... | desativar NOME...
+import os
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+
+from config import SERVIDOR_URLS, CUSTOM_SERVERS_FILE, REGISTRY_DB
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registry (
+    nome TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    grupo TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    intervalo REAL,
+    timeout REAL,
+    profundo INTEGER,
+    ativo INTEGER NOT NULL DEFAULT 1,
+    posicao INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS registry_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO registry_meta(key, value) VALUES ('version', '0');
+INSERT OR IGNORE INTO registry_meta(key, value) VALUES ('seeded', '0');
+"""
+
+COLUMNS = "nome, url, grupo, tags, intervalo, timeout, profundo, ativo"
+
+# Campos ausentes (NULL) mantêm o valor já cadastrado; a linha só é regravada (e a
+# versão só muda) quando algum campo muda de fato
+UPSERT = """
+INSERT INTO registry(nome, url, grupo, tags, intervalo, timeout, profundo, ativo, posicao)
+VALUES (:nome, :url, COALESCE(:grupo, ''), COALESCE(:tags, '[]'), :intervalo, :timeout, :profundo,
+        COALESCE(:ativo, 1), (SELECT COALESCE(MAX(posicao), 0) + 1 FROM registry))
+ON CONFLICT(nome) DO UPDATE SET url = :url, grupo = COALESCE(:grupo, grupo), tags = COALESCE(:tags, tags),
+    intervalo = COALESCE(:intervalo, intervalo), timeout = COALESCE(:timeout, timeout),
+    profundo = COALESCE(:profundo, profundo), ativo = COALESCE(:ativo, ativo)
+WHERE url IS NOT :url OR grupo IS NOT COALESCE(:grupo, grupo) OR tags IS NOT COALESCE(:tags, tags)
+    OR intervalo IS NOT COALESCE(:intervalo, intervalo) OR timeout IS NOT COALESCE(:timeout, timeout)
+    OR profundo IS NOT COALESCE(:profundo, profundo) OR ativo IS NOT COALESCE(:ativo, ativo)
+"""
+
+# Servidor no formato usado pelo monitor: {"nome", "url"} e só os campos definidos
+# ("grupo", "tags", "intervalo", "timeout", "deep"; "ativo" apenas quando desativado)
+def _to_server(row):
+    nome, url, grupo, tags, intervalo, timeout, profundo, ativo = row
+    servidor = {"nome": nome, "url": url}
+    if grupo:
+        servidor["grupo"] = grupo
+    tags = json.loads(tags)
+    if tags:
+        servidor["tags"] = tags
+    if intervalo:
+        servidor["intervalo"] = intervalo
+    if timeout:
+        servidor["timeout"] = timeout
+    if profundo is not None:
+        servidor["deep"] = bool(profundo)
+    if not ativo:
+        servidor["ativo"] = False
+    return servidor
+
+# Parâmetros do UPSERT; campos não informados ficam None (mantêm o valor cadastrado)
+# Intervalo/timeout 0 e grupo/tags vazios informados voltam ao padrão
+def _to_row(servidor):
+    nome = str(servidor["nome"]).strip()
+    url = str(servidor["url"]).strip()
+    if not nome or not url:
+        raise ValueError("servidor sem nome ou URL")
+    row = {"nome": nome, "url": url, "grupo": None, "tags": None, "intervalo": None, "timeout": None,
+           "profundo": None, "ativo": None}
+    if "grupo" in servidor:
+        row["grupo"] = servidor["grupo"] or ""
+    if "tags" in servidor:
+        tags = servidor["tags"] or []
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(",") if t.strip()]
+        row["tags"] = json.dumps(sorted(set(tags)), ensure_ascii=False)
+    for field in ("intervalo", "timeout"):
+        if field in servidor:
+            row[field] = float(servidor[field] or 0)
+    if servidor.get("deep") is not None:
+        row["profundo"] = int(bool(servidor["deep"]))
+    if "ativo" in servidor:
+        row["ativo"] = int(bool(servidor["ativo"]))
+    return row
+
+class ServerRegistry:
+    """Cadastro de servidores em SQLite; a lista ativa fica em cache até a versão mudar."""
+
+    def __init__(self, path=REGISTRY_DB):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=30,
+                                    isolation_level=None)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.cached_version = None
+        self.cached = []
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # Versão do cadastro: muda a cada alteração, de qualquer processo
+    def version(self):
+        with self.lock:
+            return int(self.conn.execute("SELECT value FROM registry_meta WHERE key = 'version'").fetchone()[0])
+
+    def _write(self, sql_params):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = 0
+                for sql, params in sql_params:
+                    count += self.conn.executemany(sql, params).rowcount
+                if count:
+                    self.conn.execute("UPDATE registry_meta SET value = CAST(value AS INTEGER) + 1 "
+                                      "WHERE key = 'version'")
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return count
+
+    # Servidores ativos, na ordem de cadastro (relidos só quando a versão muda)
+    def servers(self):
+        with self.lock:
+            version = self.version()
+            if version != self.cached_version:
+                rows = self.conn.execute(f"SELECT {COLUMNS} FROM registry WHERE ativo = 1 ORDER BY posicao")
+                self.cached = [_to_server(row) for row in rows]
+                self.cached_version = version
+            return list(self.cached)
+
+    # Todos os servidores, inclusive os desativados (para o painel e a linha de comando)
+    def all(self):
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {COLUMNS} FROM registry ORDER BY posicao").fetchall()
+        return [_to_server(row) for row in rows]
+
+    def get(self, nome):
+        with self.lock:
+            row = self.conn.execute(f"SELECT {COLUMNS} FROM registry WHERE nome = ?", (nome,)).fetchone()
+        return _to_server(row) if row else None
+
+    # Inclui ou atualiza vários servidores numa única transação
+    def upsert_many(self, servidores):
+        return self._write([(UPSERT, [_to_row(s) for s in servidores])])
+
+    def add(self, servidor):
+        return self.upsert_many([servidor])
+
+    def remove(self, nomes):
+        return self._write([("DELETE FROM registry WHERE nome = ?", [(n,) for n in nomes])])
+
+    def set_enabled(self, nomes, ativo=True):
+        return self._write([("UPDATE registry SET ativo = ? WHERE nome = ? AND ativo != ?",
+                             [(int(ativo), n, int(ativo)) for n in nomes])])
+
+    # Semeia o cadastro com SERVIDOR_URLS uma única vez (cadastro novo) e migra o antigo
+    # arquivo de servidores personalizados. Depois disso o cadastro é a fonte: servidores
+    # removidos não voltam a cada início de processo
+    def seed(self, urls=None, custom_file=CUSTOM_SERVERS_FILE):
+        urls = SERVIDOR_URLS if urls is None else urls
+        added = 0
+        with self.lock:
+            claimed = self.conn.execute("UPDATE registry_meta SET value = '1' "
+                                        "WHERE key = 'seeded' AND value = '0'").rowcount
+            # Cadastros semeados antes desta marca já têm servidores
+            empty = self.conn.execute("SELECT 1 FROM registry LIMIT 1").fetchone() is None
+        if claimed and empty:
+            rows = [(nome, url) for nome, url in urls.items()]
+            added = self._write([(
+                "INSERT OR IGNORE INTO registry(nome, url, posicao) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(posicao), 0) + 1 FROM registry))", rows)])
+        if custom_file and os.path.exists(custom_file):
+            with open(custom_file, 'r', encoding='utf-8') as f:
+                added += self.upsert_many(json.load(f))
+            os.replace(custom_file, f"{custom_file}.migrado")
+        if added:
+            logger.info("Cadastro de servidores: %d incluídos a partir da configuração", added)
+        return added
+
+_registry = None
+_registry_lock = threading.Lock()
+
+# Cadastro compartilhado pelo processo (aberto e semeado no primeiro uso)
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ServerRegistry()
+            _registry.seed()
+        return _registry
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cadastro de servidores do monitor IPTV")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="lista todos os servidores")
+    importar = sub.add_parser("importar", help="inclui/atualiza servidores de um JSON "
+                                              "([{nome, url, grupo, tags, intervalo, timeout, ativo}])")
+    importar.add_argument("arquivo")
+    importar.add_argument("--grupo", help="grupo para os servidores sem grupo")
+    for comando in ("remover", "ativar", "desativar"):
+        sub.add_parser(comando).add_argument("nomes", nargs="+")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    registry = get_registry()
+    if args.comando == "listar":
+        for servidor in registry.all():
+            print(json.dumps(servidor, ensure_ascii=False))
+    elif args.comando == "importar":
+        with open(args.arquivo, 'r', encoding='utf-8') as f:
+            servidores = json.load(f)
+        if args.grupo:
+            servidores = [dict({"grupo": args.grupo}, **s) for s in servidores]
+        print(f"{registry.upsert_many(servidores)} servidores incluídos/atualizados")
+    elif args.comando == "remover":
+        print(f"{registry.remove(args.nomes)} servidores removidos")
+    else:
+        print(f"{registry.set_enabled(args.nomes, args.comando == 'ativar')} servidores alterados")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Percentis de tempo de resposta, TTFB e latência por servidor e hora
+# Cada hora de cada servidor guarda um esboço de quantis (baldes logarítmicos, erro
+# relativo de 1%, como o DDSketch): tamanho limitado, independente do número de
+# amostras, e esboços de horas vizinhas se juntam para percentis em janela móvel.
+import os
+import json
+import math
+import time
+
+SKETCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketches (
+    bucket INTEGER NOT NULL,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    metric TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (bucket, server_id, metric)
+) WITHOUT ROWID;
+"""
+
+# Métricas das amostras: tempo de resposta (s), TTFB (s) e latência (ms)
+METRICS = ("response_time", "ttfb", "latency")
+BUCKET_SECONDS = 3600
+RETENTION_DAYS = 30
+# Intervalo (s) entre gravações dos esboços da hora corrente, que ficam em memória
+SKETCH_FLUSH_SECONDS = float(os.environ.get("SKETCH_FLUSH_SECONDS", "60"))
+RELATIVE_ACCURACY = 0.01
+MAX_BINS = 512
+
+class QuantileSketch:
+    """Esboço de quantis com erro relativo limitado; add e merge em O(1) por balde."""
+
+    __slots__ = ("alpha", "gamma", "log_gamma", "bins", "zeros", "count", "min", "max")
+
+    def __init__(self, alpha=RELATIVE_ACCURACY):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        if value is None or value != value or value < 0:
+            return
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value < 1e-9:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        if len(self.bins) > MAX_BINS:
+            self._collapse()
+
+    # Junta os baldes mais baixos (perde precisão só nos menores valores)
+    def _collapse(self):
+        keys = sorted(self.bins)
+        extra = len(keys) - MAX_BINS
+        merged = sum(self.bins.pop(k) for k in keys[:extra + 1])
+        self.bins[keys[extra]] = self.bins.get(keys[extra], 0) + merged
+
+    def merge(self, other):
+        for index, n in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > MAX_BINS:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_json(self):
+        return json.dumps({"a": self.alpha, "z": self.zeros, "n": self.count, "lo": self.min,
+                           "hi": self.max, "b": sorted(self.bins.items())})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data["a"])
+        sketch.zeros = data["z"]
+        sketch.count = data["n"]
+        sketch.min = data["lo"]
+        sketch.max = data["hi"]
+        sketch.bins = {int(k): v for k, v in data["b"]}
+        return sketch
+
+UPSERT = """
+INSERT INTO sketches(bucket, server_id, metric, data) VALUES (?, ?, ?, ?)
+ON CONFLICT(bucket, server_id, metric) DO UPDATE SET data = excluded.data
+"""
+
+class Sketches:
+    """Esboços por (hora, servidor, métrica); usa a conexão e a trava do HistoryStore.
+
+    Os esboços da hora corrente ficam em memória; os alterados são gravados na troca
+    de hora ou a cada SKETCH_FLUSH_SECONDS (flush), não a cada verificação.
+    """
+
+    def __init__(self, conn, flush_seconds=SKETCH_FLUSH_SECONDS):
+        self.conn = conn
+        self.conn.executescript(SKETCH_SCHEMA)
+        self.flush_seconds = flush_seconds
+        self.current = {}   # (balde, server_id, métrica) -> QuantileSketch
+        self.dirty = set()  # chaves de `current` ainda não gravadas
+        self.flushed_at = time.monotonic()
+
+    def _sketch(self, bucket, server_id, metric):
+        key = (bucket, server_id, metric)
+        sketch = self.current.get(key)
+        if sketch is None:
+            row = self.conn.execute("SELECT data FROM sketches WHERE bucket = ? AND server_id = ? AND metric = ?",
+                                    key).fetchone()
+            sketch = self.current[key] = QuantileSketch.from_json(row[0]) if row else QuantileSketch()
+        return sketch
+
+    # Grava os esboços alterados desde a última gravação
+    # Deve ser chamado dentro de uma transação (HistoryStore)
+    def flush(self):
+        if self.dirty:
+            self.conn.executemany(UPSERT, [key + (self.current[key].to_json(),) for key in self.dirty])
+            self.dirty = set()
+        self.flushed_at = time.monotonic()
+
+    # Acrescenta as amostras aos esboços em memória; grava na troca de hora ou quando
+    # SKETCH_FLUSH_SECONDS passaram desde a última gravação
+    # Deve ser chamado dentro da transação que grava as amostras
+    # rows = [(server_id, tempo_resposta, ttfb, latencia), ...]
+    def add(self, ts, rows):
+        bucket = ts - ts % BUCKET_SECONDS
+        if any(key[0] != bucket for key in self.current):
+            self.flush()
+            self.current = {key: s for key, s in self.current.items() if key[0] == bucket}
+        for server_id, *values in rows:
+            for metric, value in zip(METRICS, values):
+                if value is None:
+                    continue
+                self._sketch(bucket, server_id, metric).add(value)
+                self.dirty.add((bucket, server_id, metric))
+        if time.monotonic() - self.flushed_at >= self.flush_seconds:
+            self.flush()
+
+    # Reconstrói os esboços a partir das amostras (bancos criados antes dos esboços)
+    def rebuild(self):
+        self.conn.execute("DELETE FROM sketches")
+        self.current = {}
+        self.dirty = set()
+        sketches = {}
+        cursor = self.conn.execute("SELECT ts, server_id, response_time, ttfb, latency FROM samples ORDER BY ts")
+        for ts, server_id, *values in cursor:
+            bucket = ts - ts % BUCKET_SECONDS
+            for metric, value in zip(METRICS, values):
+                if value is not None:
+                    key = (bucket, server_id, metric)
+                    sketches.setdefault(key, QuantileSketch()).add(value)
+        self.conn.executemany(UPSERT, [key + (s.to_json(),) for key, s in sketches.items()])
+
+    def compact(self, now_ts):
+        self.conn.execute("DELETE FROM sketches WHERE bucket < ?", (now_ts - RETENTION_DAYS * 86400,))
+
+    # Esboços por hora no período [start, end): {nome: [(balde, QuantileSketch)]} em ordem de tempo
+    def series(self, metric, start, end, names=None):
+        sql = ("SELECT v.name, k.bucket, k.data FROM sketches k JOIN servers v ON v.id = k.server_id "
+               "WHERE k.metric = ? AND k.bucket >= ? AND k.bucket < ?")
+        params = [metric, start - start % BUCKET_SECONDS, end]
+        if names is not None:
+            sql += f" AND v.name IN ({','.join('?' for _ in names)})"
+            params += list(names)
+        result = {}
+        for name, bucket, data in self.conn.execute(sql + " ORDER BY k.bucket", params):
+            result.setdefault(name, []).append((bucket, QuantileSketch.from_json(data)))
+        return result
+
+# Percentis em janela móvel de `window` horas: [(balde, {q: valor})] por servidor
+def rolling_quantiles(series, quantiles=(0.5, 0.95, 0.99), window=1):
+    result = []
+    for i, (bucket, _) in enumerate(series):
+        merged = QuantileSketch()
+        for other_bucket, sketch in series[max(0, i - window + 1):i + 1]:
+            if bucket - other_bucket < window * BUCKET_SECONDS:
+                merged.merge(sketch)
+        result.append((bucket, {q: merged.quantile(q) for q in quantiles}))
+    return result
@@ -0,0 +1,117 @@
+# Estado compartilhado do monitor (status por servidor, última tabela, relatórios)
+# Um único armazenamento por processo, persistido em SQLite: sobrevive a reinícios
+# e é lido por todas as sessões do painel. As transições de status são gravadas
+# com compare-and-set, então um alerta só é disparado uma vez mesmo que haja mais
+# de um monitor apontando para o mesmo arquivo.
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import TZ, STATE_DB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS server_state (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+"""
+
+# Nome usado para valores globais (que não pertencem a um servidor)
+GLOBAL = ""
+
+class StateStore:
+    """Chave-valor por servidor em SQLite; seguro para várias threads e processos."""
+
+    def __init__(self, path=STATE_DB):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=30,
+                                    isolation_level=None)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get(self, name, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM server_state WHERE name = ? AND key = ?",
+                                    (name, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_many(self, items):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO server_state(name, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, key) DO UPDATE SET value = excluded.value",
+                    [(name, key, json.dumps(value, ensure_ascii=False)) for name, key, value in items])
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def set(self, name, key, value):
+        self.set_many([(name, key, value)])
+
+    # Grava `value` atomicamente; retorna (mudou, valor anterior)
+    def transition(self, name, key, value):
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT value FROM server_state WHERE name = ? AND key = ?",
+                                        (name, key)).fetchone()
+                changed = row is None or row[0] != encoded
+                if changed:
+                    self.conn.execute(
+                        "INSERT INTO server_state(name, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT(name, key) DO UPDATE SET value = excluded.value",
+                        (name, key, encoded))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return changed, (json.loads(row[0]) if row else None)
+
+    # Todos os valores de uma chave: {servidor: valor}
+    def section(self, key):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, value FROM server_state WHERE key = ? AND name != ?",
+                                     (key, GLOBAL)).fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    # Versão da última tabela publicada; o painel só relê os dados quando ela muda
+    def version(self):
+        return self.get(GLOBAL, "version", 0)
+
+    # Publica a tabela para o painel (ordem dos servidores, horário e fila)
+    def publish(self, names, refreshed_at, queue=None):
+        self.set_many([
+            (GLOBAL, "table", names),
+            (GLOBAL, "last_refresh", refreshed_at.strftime('%Y-%m-%d %H:%M:%S')),
+            (GLOBAL, "queue", queue),
+            (GLOBAL, "version", time.time_ns()),
+        ])
+
+    # Dados da última publicação: {rows, last_error, last_refresh, queue}
+    def dashboard(self):
+        with self.lock:
+            names = self.get(GLOBAL, "table", [])
+            last_refresh = self.get(GLOBAL, "last_refresh")
+            queue = self.get(GLOBAL, "queue")
+            rows = self.section("row")
+            last_error = self.section("last_error")
+        return {
+            "rows": [rows[name] for name in names if name in rows],
+            "last_error": last_error,
+            "last_refresh": TZ.localize(datetime.strptime(last_refresh, '%Y-%m-%d %H:%M:%S')) if last_refresh else None,
+            "queue": queue,
+        }
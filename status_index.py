@@ -0,0 +1,90 @@
+# Índice da tabela de status do painel
+# Montado uma vez por versão publicada: colunas NumPy para os filtros (status e texto
+# de busca com nome, grupo e tags) e a ordem de cada chave de ordenação já calculada.
+# Uma consulta combina máscaras booleanas com a ordem escolhida; só as linhas da
+# página pedida viram DataFrame e são enviadas ao navegador.
+import numpy as np
+import pandas as pd
+
+# Chaves de ordenação da tabela
+SORT_KEYS = ["Nome", "Status", "Tempo de Resposta", "Latência (Ping)", "Última Verificação"]
+
+# Primeiro número de um texto formatado ("1.23s", "12.3 ms (±0.4)"); NaN se não houver
+def _number(text):
+    try:
+        return float(str(text).split()[0].rstrip("s"))
+    except (ValueError, IndexError):
+        return np.nan
+
+class StatusIndex:
+    """Linhas da última verificação com filtros e ordenações pré-calculados."""
+
+    def __init__(self, rows, columns, last_error=None, servidores=None):
+        self.rows = rows
+        self.columns = columns
+        last_error = last_error or {}
+        meta = {s["nome"]: s for s in servidores or []}
+        n = len(rows)
+        names = [row["Nome"] for row in rows]
+        status = [row["Status"] for row in rows]
+        self.last_error = [last_error.get(nome) or "" for nome in names]
+        self.online = np.fromiter(("Online" in s for s in status), bool, n)
+        self.offline = np.fromiter(("Offline" in s for s in status), bool, n)
+        # Texto de busca: nome, grupo e tags do cadastro, em minúsculas
+        # (lista de str: `in` do Python é bem mais rápido que np.char.find)
+        self.text = [" ".join([nome, meta.get(nome, {}).get("grupo", "")] + meta.get(nome, {}).get("tags", [])).lower()
+                     for nome in names]
+        self.response_time = np.array([_number(row["Tempo de Resposta"]) for row in rows], dtype=float)
+        latency = np.array([_number(row["Latência (Ping)"]) for row in rows], dtype=float)
+        lower = np.array([nome.lower() for nome in names], dtype=str)
+        checked = np.array([row["Última Verificação"] for row in rows], dtype=str)
+
+        # Ordem crescente e decrescente de cada chave; números ausentes ficam sempre no fim
+        by_name = np.argsort(lower, kind="stable")
+        self.orders = {("Nome", False): by_name, ("Nome", True): by_name[::-1]}
+        # Status: offline primeiro, depois desconhecidos e online, cada grupo por nome
+        rank = np.where(self.offline, 0, np.where(self.online, 2, 1))
+        by_status = by_name[np.argsort(rank[by_name], kind="stable")]
+        self.orders[("Status", False)] = by_status
+        self.orders[("Status", True)] = by_name[np.argsort(-rank[by_name], kind="stable")]
+        for key, values in (("Tempo de Resposta", self.response_time), ("Latência (Ping)", latency)):
+            self.orders[(key, False)] = by_name[np.argsort(values[by_name], kind="stable")]
+            self.orders[(key, True)] = by_name[np.argsort(-values[by_name], kind="stable")]
+        by_checked = by_name[np.argsort(checked[by_name], kind="stable")]
+        self.orders[("Última Verificação", False)] = by_checked
+        self.orders[("Última Verificação", True)] = by_checked[::-1]
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Servidores online e tempo médio de resposta da última verificação
+    def online_count(self):
+        return int(self.online.sum())
+
+    def avg_response(self):
+        valid = ~np.isnan(self.response_time)
+        return float(self.response_time[valid].mean()) if valid.any() else 0
+
+    # Posições das linhas que passam pelos filtros, na ordem pedida
+    # `statuses` = rótulos aceitos ("Online", "Offline"; vazio aceita todos);
+    # `search` = palavras procuradas no nome, grupo e tags (todas precisam aparecer)
+    def select(self, statuses=(), search="", sort="Nome", descending=False):
+        mask = np.ones(len(self.rows), dtype=bool)
+        if statuses:
+            mask = np.zeros(len(self.rows), dtype=bool)
+            if "Online" in statuses:
+                mask |= self.online
+            if "Offline" in statuses:
+                mask |= self.offline
+        for word in search.lower().split():
+            mask &= np.fromiter((word in text for text in self.text), bool, len(self.text))
+        order = self.orders[(sort, descending)]
+        return order[mask[order]]
+
+    # DataFrame só com as linhas da página (`page` começa em 1), com o último erro
+    def page(self, selected, page=1, page_size=50):
+        start = (page - 1) * page_size
+        ids = selected[start:start + page_size]
+        df = pd.DataFrame([self.rows[i] for i in ids], columns=self.columns)
+        df["Último Erro"] = [self.last_error[i] for i in ids]
+        return df
@@ -0,0 +1,192 @@
+# Verificação profunda de streams HLS/M3U
+# Lê e interpreta a playlist, segue uma variante (playlist master) ou o primeiro canal
+# (lista M3U), baixa o primeiro segmento e mede TTFB, vazão e atualização da playlist.
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+
+# Ativa a verificação profunda para todos os servidores (ou use "deep": true por servidor)
+DEEP_CHECK = os.environ.get("PROBE_DEEP", "0") == "1"
+# Vazão mínima do segmento em Mbit/s para o servidor não ser considerado lento (0 desativa)
+MIN_MBPS = float(os.environ.get("PROBE_MIN_MBPS", "2"))
+# Limites da amostra de segmento (streams contínuos .ts não terminam)
+SEGMENT_MAX_BYTES = int(os.environ.get("PROBE_SEGMENT_MAX_BYTES", str(4 * 1024 * 1024)))
+SEGMENT_MAX_SECONDS = float(os.environ.get("PROBE_SEGMENT_MAX_SECONDS", "8"))
+PLAYLIST_MAX_BYTES = 2 * 1024 * 1024
+
+class StreamError(Exception):
+    """Falha de conteúdo: a URL respondeu, mas não entrega um stream utilizável."""
+
+# Interpreta uma playlist M3U/M3U8 (master, de mídia ou lista de canais)
+def parse_playlist(text, base_url):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("#EXTM3U"):
+        raise StreamError("Playlist inválida")
+    playlist = {"variants": [], "segments": [], "media_sequence": None, "target_duration": None,
+                "program_date_time": None, "endlist": False}
+    pending = {}
+    for line in lines[1:]:
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending = {"bandwidth": _attribute(line, "BANDWIDTH")}
+        elif line.startswith("#EXTINF:"):
+            try:
+                pending = {"duration": float(line[8:].split(",")[0])}
+            except ValueError:
+                pending = {"duration": None}
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            playlist["media_sequence"] = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist["target_duration"] = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-PROGRAM-DATE-TIME:"):
+            playlist["program_date_time"] = _parse_iso(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist["endlist"] = True
+        elif not line.startswith("#"):
+            entry = dict(pending, uri=urljoin(base_url, line))
+            if "bandwidth" in pending:
+                playlist["variants"].append(entry)
+            else:
+                playlist["segments"].append(entry)
+            pending = {}
+    return playlist
+
+def _attribute(line, name):
+    for part in line.split(":", 1)[1].split(","):
+        key, _, value = part.partition("=")
+        if key.strip() == name:
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+def _parse_iso(value):
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _read_playlist(response):
+    body = b""
+    for chunk in response.iter_content(chunk_size=16384):
+        body += chunk
+        if len(body) > PLAYLIST_MAX_BYTES:
+            raise StreamError("Playlist muito grande")
+    if not body:
+        raise StreamError("Sem conteúdo")
+    return body.decode(response.encoding or "utf-8", errors="replace")
+
+# Idade da playlist em segundos: PROGRAM-DATE-TIME do último segmento ou Last-Modified
+def _freshness(playlist, response):
+    now = datetime.now(timezone.utc)
+    pdt = playlist["program_date_time"]
+    if pdt is not None:
+        if pdt.tzinfo is None:
+            pdt = pdt.replace(tzinfo=timezone.utc)
+        return max(0.0, (now - pdt).total_seconds())
+    last_modified = response.headers.get("Last-Modified")
+    if last_modified:
+        try:
+            return max(0.0, (now - parsedate_to_datetime(last_modified)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    return None
+
+# Lê parte de uma resposta já aberta e mede a vazão
+# `ttfb` é o tempo até os cabeçalhos; o primeiro bloco do corpo é somado a ele
+# A vazão conta só os bytes recebidos depois do primeiro bloco, no tempo desde a sua
+# chegada; com um único bloco não há medida (None, nunca considerado lento)
+def _measure(response, ttfb):
+    started = time.perf_counter()
+    first = first_size = None
+    size = 0
+    for chunk in response.iter_content(chunk_size=16384):
+        if first is None:
+            first = time.perf_counter()
+            first_size = len(chunk)
+        size += len(chunk)
+        if size >= SEGMENT_MAX_BYTES or time.perf_counter() - started >= SEGMENT_MAX_SECONDS:
+            break
+    if not size:
+        raise StreamError("Segmento vazio")
+    transfer = time.perf_counter() - first
+    rest = size - first_size
+    throughput = rest * 8 / transfer / 1e6 if rest and transfer > 0 else None
+    return {"segment_ttfb": ttfb + (first - started), "segment_bytes": size, "throughput_mbps": throughput}
+
+# Baixa parte do segmento e mede a vazão
+def _sample_segment(sessions, url, timeout):
+    started = time.perf_counter()
+    response = sessions.get(url).get(url, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        return _measure(response, time.perf_counter() - started)
+    finally:
+        response.close()
+
+# Verificação profunda a partir da resposta já aberta da URL do servidor
+# `sessions` é o SessionPool usado para as requisições seguintes (variante, segmento).
+# `ttfb` é o tempo até o primeiro byte dessa resposta. Levanta StreamError quando
+# o conteúdo não é um stream utilizável (HTML de erro, playlist vazia, segmento vazio).
+def inspect_stream(response, sessions, ttfb, timeout=30):
+    details = {"ttfb": ttfb}
+    if response.status_code >= 400:
+        raise StreamError(f"HTTP {response.status_code}")
+    content_type = response.headers.get("Content-Type", "").lower()
+    if "text/html" in content_type:
+        raise StreamError("Página HTML em vez de playlist")
+    if "mpegurl" not in content_type and not response.url.split("?")[0].lower().endswith((".m3u8", ".m3u")):
+        # Stream contínuo (ex.: .ts direto): mede a vazão na própria resposta, sem abrir
+        # outra conexão (painéis IPTV costumam aceitar uma conexão por linha)
+        details.update(_measure(response, ttfb))
+        return details
+
+    playlist = parse_playlist(_read_playlist(response), response.url)
+    base_response = response
+    if playlist["variants"]:
+        # Playlist master: segue a variante de menor banda (menor custo de verificação)
+        variant = min(playlist["variants"], key=lambda v: v["bandwidth"] or 0)
+        base_response = sessions.get(variant["uri"]).get(variant["uri"], timeout=timeout, stream=True)
+        try:
+            base_response.raise_for_status()
+            playlist = parse_playlist(_read_playlist(base_response), base_response.url)
+        finally:
+            base_response.close()
+    if not playlist["segments"]:
+        raise StreamError("Playlist vazia")
+
+    segment = playlist["segments"][0]
+    if segment["uri"].split("?")[0].lower().endswith((".m3u8", ".m3u")):
+        # Lista de canais M3U: o primeiro canal aponta para outra playlist
+        nested = sessions.get(segment["uri"]).get(segment["uri"], timeout=timeout, stream=True)
+        try:
+            nested.raise_for_status()
+            playlist = parse_playlist(_read_playlist(nested), nested.url)
+            base_response = nested
+        finally:
+            nested.close()
+        if not playlist["segments"]:
+            raise StreamError("Playlist vazia")
+        segment = playlist["segments"][0]
+
+    details.update(_sample_segment(sessions, segment["uri"], timeout))
+    details["media_sequence"] = playlist["media_sequence"]
+    details["freshness"] = None if playlist["endlist"] else _freshness(playlist, base_response)
+    return details
+
+# Resumo legível para a coluna "Detalhes" do painel
+def describe(details):
+    parts = []
+    if details.get("ttfb") is not None:
+        parts.append(f"TTFB {details['ttfb']:.2f}s")
+    if details.get("throughput_mbps") is not None:
+        parts.append(f"{details['throughput_mbps']:.1f} Mbit/s")
+    if details.get("freshness") is not None:
+        parts.append(f"atualizada há {details['freshness']:.0f}s")
+    return " | ".join(parts)
+
+def is_slow(details):
+    mbps = details.get("throughput_mbps")
+    return MIN_MBPS > 0 and mbps is not None and mbps < MIN_MBPS